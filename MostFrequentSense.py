@@ -1,36 +1,127 @@
 import pandas as pd
-from nltk.corpus import wordnet as wn
+import numpy as np
+import os
+from functools import partial
+import metrics
+from baseClassifier import Classifier
+from wordnetSnapshot import loadSnapshot, wordnetVersion, SNAPSHOT_DIRECTORY
+from datasets import targetWords
 
-class MostFrequentSense:
+TABLE_PATH = "models/mostFreq/mostFrequentSense.npz"
+RESULTS_PATH = "results/mostFreq/mostFreq_{}_predicted.txt"
 
-    def __init__(self):
-        self.semeval2007 = None  # Test dataset
-        self.semeval2013 = None  # Test dataset
-        self.semeval2015 = None  # Test dataset
-        self.senseval2 = None  # Test dataset
-        self.senseval3 = None  # Test dataset
-        self.allTest = None  # All test datasets
+# WordNet part of speech of the pos attributes in the XML files
+WORDNET_POS = {"NOUN": "n", "VERB": "v", "ADJ": "a", "ADV": "r"}
 
+class MostFrequentSense(Classifier):
 
-    def loadData(self):
+    resultsPath = RESULTS_PATH
+
+    def __init__(self, usePos = False):
+        super().__init__()
+
+        self.wordnet = None         # WordNetSnapshot with the synsets and sense keys
+        self.usePos = usePos        # Use the most frequent sense of the word with the part of speech of the instance?
+        self.table = None           # Series with index: lemma, value: most frequent sense
+        self.posTable = None        # Series with index: lemma and part of speech separated by a tab, value: most frequent sense
+        self.lookups = {}           # Dictionary with key: tuple of a word that is not in the table and its part of speech or None, value: most frequent sense or None
+        self.tablePath = TABLE_PATH # File path to the most frequent sense table
+
+
+    def prepare(self):
         """
-        Load the test datasets, and remove rows with NaN values.
-        """ 
+        Load the most frequent sense table, building it first if it does not exist.
+        """
+
+        self.loadTable(self.tablePath)
+
+
+    def getFactory(self):
+        """
+        :return: function without arguments that returns a classifier with the same table, for worker processes
+        """
+
+        return partial(MostFrequentSense.fromTable, self.tablePath, self.usePos)
+
+
+    def loadWordNet(self, directory = SNAPSHOT_DIRECTORY):
+        """
+        Load the WordNet snapshot. The snapshot is built first if it does not exist, including the target words of the loaded datasets.
+
+        :param directory: directory of the snapshot files
+        """
+
+        self.wordnet = loadSnapshot(directory, targetWords(self.testDatasets().values()))
+
+
+    def buildTable(self, extraWords = ()):
+        """
+        Find the most frequent sense of every lemma in WordNet, with and without its part of speech.
 
-        # Load the test datasets
-        semeval2007 = pd.read_csv("data/cleaned/semeval2007.csv")
-        semeval2013 = pd.read_csv("data/cleaned/semeval2013.csv")
-        semeval2015 = pd.read_csv("data/cleaned/semeval2015.csv")
-        senseval2 = pd.read_csv("data/cleaned/senseval2.csv")
-        senseval3 = pd.read_csv("data/cleaned/senseval3.csv")
-        allTest = pd.read_csv("data/cleaned/allTest.csv")
+        :param extraWords: words to add to the table that are not lemma names in WordNet, e.g. the target words of the test datasets
+        """
+
+        if self.wordnet is None:
+            self.loadWordNet()
+
+        # WordNet lower-cases words when looking up synsets
+        lemmas = sorted(set(self.wordnet.allWords()) | {word.lower() for word in extraWords})
+        table = {}
+        posTable = {}
+        for lemma in lemmas:
+            synsets = self.wordnet.synsets(lemma)
+            if len(synsets) > 0:
+                table[lemma] = self.wordnet.senseKey(synsets[0])
+            for tag, pos in WORDNET_POS.items():
+                synsets = self.wordnet.synsets(lemma, pos)
+                if len(synsets) > 0:
+                    posTable[lemma + "\t" + tag] = self.wordnet.senseKey(synsets[0])
+
+        self.table = pd.Series(table, dtype = object)
+        self.posTable = pd.Series(posTable, dtype = object)
+
+
+    def loadTable(self, path = TABLE_PATH):
+        """
+        Load the most frequent sense table from file. The table is built and saved first if the file does not exist
+        or was built from another WordNet version. Loading the table does not load WordNet.
+
+        :param path: file path to the most frequent sense table
+        """
+
+        self.tablePath = path
+        self.lookups = {}
+        if os.path.exists(path):
+            with np.load(path) as arrays:
+                if "wordnetVersion" in arrays and str(arrays["wordnetVersion"]) == wordnetVersion():
+                    self.table = pd.Series(arrays["senses"], index = arrays["lemmas"], dtype = object)
+                    self.posTable = pd.Series(arrays["posSenses"], index = arrays["posLemmas"], dtype = object)
+                    metrics.increment("mostFreq.tableCache.hit")
+                    return
+
+        metrics.increment("mostFreq.tableCache.miss")
+        # Add the target words of the loaded datasets that WordNet only finds after morphological processing
+        self.buildTable(targetWords(self.testDatasets().values()))
 
-        self.semeval2007 = semeval2007.dropna().reset_index(drop = True) 
-        self.semeval2013 = semeval2013.dropna().reset_index(drop = True)
-        self.semeval2015 = semeval2015.dropna().reset_index(drop = True) 
-        self.senseval2 = senseval2.dropna().reset_index(drop = True) 
-        self.senseval3 = senseval3.dropna().reset_index(drop = True)
-        self.allTest = allTest.dropna().reset_index(drop = True)
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        np.savez_compressed(path, wordnetVersion = np.array(self.wordnet.version),
+                            lemmas = self.table.index.to_numpy(dtype = str), senses = self.table.to_numpy(dtype = str),
+                            posLemmas = self.posTable.index.to_numpy(dtype = str), posSenses = self.posTable.to_numpy(dtype = str))
+
+
+    @classmethod
+    def fromTable(cls, path = TABLE_PATH, usePos = False):
+        """
+        Create a classifier with the most frequent sense table loaded from file.
+
+        :param path: file path to the most frequent sense table
+        :param usePos: boolean value - use the part of speech of the instances?
+        :return: MostFrequentSense ready to classify
+        """
+
+        mostFrequentSense = cls(usePos)
+        mostFrequentSense.loadTable(path)
+        return mostFrequentSense
 
 
     def classify(self, row):
@@ -43,39 +134,62 @@ class MostFrequentSense:
         """ 
 
         word = row.target_word
-        synsets = wn.synsets(word)
+        if self.wordnet is None:
+            self.loadWordNet()
+        synsets = metrics.timedCall("wordnet.synsets", self.wordnet.synsets, word)
 
         if len(synsets) > 0:
-            bestSense = synsets[0].lemmas()[0].key()
+            bestSense = self.wordnet.senseKey(synsets[0])
             return bestSense
+        metrics.increment("mostFreq.unknownWord")
         return "None"
 
 
-    def runClassification(self):
+    def lookupSense(self, word, tag = None):
         """
-        Classify all the words in the test datasets and save results to file.
-        """ 
+        Find the most frequent sense of a word that is not in the table in WordNet, which also finds inflected forms
+        after morphological processing. WordNet is loaded the first time a word is looked up.
 
-        self.semeval2007["predicted"] = self.semeval2007.apply(lambda row: self.classify(row), axis = 1)
-        self.semeval2007 = self.semeval2007.drop(["target_word", "context_string"], axis = 1)
-        self.semeval2007.to_csv("results/mostFreq/mostFreq_semeval2007_predicted.txt", sep = ' ', header = False, index = False)
+        :param word: the lower-case word
+        :param tag: part of speech of the word, a key of WORDNET_POS, or None for any part of speech
+        :return: the most frequent sense class of the word, or None if WordNet has no synsets for it
+        """
 
-        self.semeval2013["predicted"] = self.semeval2013.apply(lambda row: self.classify(row), axis = 1)
-        self.semeval2013 = self.semeval2013.drop(["target_word", "context_string"], axis = 1)
-        self.semeval2013.to_csv("results/mostFreq/mostFreq_semeval2013_predicted.txt", sep = ' ', header = False, index = False)
+        key = (word, tag)
+        if key not in self.lookups:
+            if self.wordnet is None:
+                self.loadWordNet()
+            synsets = metrics.timedCall("wordnet.synsets", self.wordnet.synsets, word, WORDNET_POS.get(tag))
+            self.lookups[key] = self.wordnet.senseKey(synsets[0]) if len(synsets) > 0 else None
+        return self.lookups[key]
 
-        self.semeval2015["predicted"] = self.semeval2015.apply(lambda row: self.classify(row), axis = 1)
-        self.semeval2015 = self.semeval2015.drop(["target_word", "context_string"], axis = 1)
-        self.semeval2015.to_csv("results/mostFreq/mostFreq_semeval2015_predicted.txt", sep = ' ', header = False, index = False)
 
-        self.senseval2["predicted"] = self.senseval2.apply(lambda row: self.classify(row), axis = 1)
-        self.senseval2 = self.senseval2.drop(["target_word", "context_string"], axis = 1)
-        self.senseval2.to_csv("results/mostFreq/mostFreq_senseval2_predicted.txt", sep = ' ', header = False, index = False)
+    def classifyBatch(self, data):
+        """
+        Classifies all the words in a dataset with a sense class.
+        With the table loaded, the words are looked up in the table, and the words that are not in it are looked up in WordNet.
+        Otherwise each word is looked up in WordNet.
+        If the part of speech is used, words without a sense for their part of speech get their most frequent sense for any part of speech.
 
-        self.senseval3["predicted"] = self.senseval3.apply(lambda row: self.classify(row), axis = 1)
-        self.senseval3 = self.senseval3.drop(["target_word", "context_string"], axis = 1)
-        self.senseval3.to_csv("results/mostFreq/mostFreq_senseval3_predicted.txt", sep = ' ', header = False, index = False)
+        :param data: DataFrame with the columns <id, target_word, context_string[, pos]>
+        :return: Series with the predicted sense class of each word, aligned with the index of data
+        """
 
-        self.allTest["predicted"] = self.allTest.apply(lambda row: self.classify(row), axis=1)
-        self.allTest = self.allTest.drop(["target_word", "context_string"], axis=1)
-        self.allTest.to_csv("results/mostFreq/mostFreq_allTest_predicted.txt", sep=' ', header=False, index=False)
\ No newline at end of file
+        if data.empty:
+            return pd.Series([], index = data.index, dtype = object)
+        if self.table is None:
+            return data.apply(lambda row: self.classify(row), axis = 1)
+
+        lemmas = data["target_word"].str.lower()
+        predicted = lemmas.map(self.table).astype(object)
+        missing = predicted.isna()
+        predicted[missing] = [self.lookupSense(word) for word in lemmas[missing]]
+        if self.usePos:
+            if "pos" not in data:
+                raise ValueError("The dataset has no pos column, preprocess it again to use the part of speech")
+            posPredicted = (lemmas + "\t" + data["pos"]).map(self.posTable).astype(object)
+            missing = posPredicted.isna() & data["pos"].isin(list(WORDNET_POS))
+            posPredicted[missing] = [self.lookupSense(word, tag) for word, tag in zip(lemmas[missing], data["pos"][missing])]
+            predicted = posPredicted.fillna(predicted)
+        metrics.increment("mostFreq.unknownWord", int(predicted.isna().sum()))
+        return predicted.fillna("None").astype(object)
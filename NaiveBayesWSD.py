@@ -1,108 +1,487 @@
 import pandas as pd
 import numpy as np
+import json
+import os
 import re
+import zlib
+from functools import partial
 from operator import itemgetter
+from scipy import sparse
+import metrics
+from baseClassifier import Classifier
+from datasets import hashPath
+from vocabulary import packStrings, saveArrays, StringArray, Vocabulary
 
+MODEL_DIRECTORY = "models/naiveBayes"
+TRAINING_PATH = "data/cleaned/semcor.csv"
+RESULTS_PATH = "results/naiveBayes/nb_{}_predicted.txt"
 
-class NaiveBayesWSD:
+
+class NaiveBayesWSD(Classifier):
+
+    resultsPath = RESULTS_PATH
 
     def __init__(self):
+        super().__init__()
+
         self.train = None                   # Training dataset
-        self.semeval2007 = None             # Test dataset
-        self.semeval2013 = None             # Test dataset
-        self.semeval2015 = None             # Test dataset
-        self.senseval2 = None               # Test dataset
-        self.senseval3 = None               # Test dataset
-        self.allTest = None                 # All test datasets
+        self.sentenceColumns = None         # Tuple of the SentenceStore, the vocabulary and the array with the vocabulary column of each token of the store, or -1
 
         self.classes = []                   # List of sense classes in training dataset
         self.classCounts = None             # Series of with index: class, value: total count in training dataset
         self.wordClasses = None             # Series with index: word, value: set of possible classes in training dataset
 
-        self.vocabulary = []                # List of vocabulary in training dataset
-        self.nVoc = 0                       # Length of vocabulary in training dataset
+        self.classIndex = {}                # Dictionary with key: class, value: row of the class in the count matrix
+
+        self.vocabulary = Vocabulary()      # Vocabulary of the training dataset, with the column of each word in the count matrix as its id
+        self.nVoc = 0                       # Length of vocabulary in training dataset, or number of hash buckets
+        self.buckets = None                 # Number of hash buckets the words are mapped to by compressModel, or None for one column per word
         self.aprioriProbabilites = []       # List of the apriori probabilities for the sense classes in the training dataset
 
+        self.tokenCounts = None             # Sparse matrix (class x vocabulary) with the frequency of each token of the vocabulary given a class
+        self.wordCounts = None              # Sparse matrix (class x vocabulary) with the frequency of each word given a class
+        self.classWordCounts = None         # Array with the total word count for each class
+        self.likelihoodDenominators = None  # Array with the smoothed likelihood denominator for each class
+        self.unseenLikelihoods = None       # Array with the log likelihood of a word that never occurs with a class
+        self.likelihoodGains = None         # Sparse matrix (class x vocabulary) with the log likelihood of a word given a class minus the unseen log likelihood
+
         self.alpha = 1                      # Smoothing parameter
+        self.modelDirectory = None          # Directory the model was saved to or loaded from
+        self.trainingFiles = {}             # Dictionary with key: file path of a training dataset the model was trained from with trainFromFile, value: its hash
 
 
-    def loadData(self):
+    def loadData(self, includeTraining = True):
         """
         Load the training and test datasets, and remove rows with NaN values.
+
+        :param includeTraining: boolean value - load the training dataset? Not needed when the model is loaded from file
         """ 
 
         # Load the training dataset
-        train = pd.read_csv("data/cleaned/semcor.csv")
-        self.train = train.dropna().reset_index(drop = True)
+        if includeTraining:
+            train = pd.read_csv(TRAINING_PATH)
+            self.train = train.dropna().reset_index(drop = True)
 
         # Load the test datasets
-        semeval2007 = pd.read_csv("data/cleaned/semeval2007.csv")
-        semeval2013 = pd.read_csv("data/cleaned/semeval2013.csv")
-        semeval2015 = pd.read_csv("data/cleaned/semeval2015.csv")
-        senseval2 = pd.read_csv("data/cleaned/senseval2.csv")
-        senseval3 = pd.read_csv("data/cleaned/senseval3.csv")
-        allTest = pd.read_csv("data/cleaned/allTest.csv")
+        super().loadData()
 
-        self.semeval2007 = semeval2007.dropna().reset_index(drop = True)
-        self.semeval2013 = semeval2013.dropna().reset_index(drop = True)
-        self.semeval2015 = semeval2015.dropna().reset_index(drop = True)
-        self.senseval2 = senseval2.dropna().reset_index(drop = True)
-        self.senseval3 = senseval3.dropna().reset_index(drop = True)
-        self.allTest = allTest.dropna().reset_index(drop=True)
 
+    def prepare(self, directory = MODEL_DIRECTORY):
+        """
+        Load the model from file. If no model was saved, or the training dataset changed since the model was trained from it,
+        it is trained from the training dataset streamed from disk and saved first.
+
+        :param directory: directory of the model files
+        """
+
+        if self.hasModel(directory) and not self.isOutdated(directory):
+            self.loadModel(directory)
+        else:
+            self.trainFromFile()
+            self.saveModel(directory)
+
+
+    def getFactory(self):
+        """
+        :return: function without arguments that returns a classifier with the saved model, for worker processes
+        """
+
+        return partial(NaiveBayesWSD.fromModel, self.modelDirectory)
 
+
+    @metrics.timed("naiveBayes.trainModel")
     def trainModel(self):
         """
         Trains the model by finding and calculating all the variables needed for the classification.
         """ 
 
-        self.classes = list(self.train["sense_class"].unique())
-        self.classCounts = self.train["sense_class"].value_counts()
-        self.wordClasses = self.train.groupby("target_word")["sense_class"].agg(set)
+        self.resetModel()
+        self.partialFit(self.train)
+
+
+    def resetModel(self):
+        """
+        Remove everything learned from the training data, so the next call to partialFit starts a new model.
+        """
+
+        self.classes = []
+        self.classIndex = {}
+        self.classCounts = pd.Series(dtype = np.int64)
+        self.wordClasses = pd.Series(dtype = object)
+        self.vocabulary = Vocabulary()
+        self.nVoc = 0
+        self.buckets = None
+        self.tokenCounts = sparse.csr_matrix((0, 0), dtype = np.int64)
+        self.classWordCounts = np.zeros(0)
+        self.trainingFiles = {}
+
+
+    @metrics.timed("naiveBayes.partialFit")
+    def partialFit(self, chunk, update = True):
+        """
+        Update the model with a chunk of training data. Only the counts of the model are kept between chunks,
+        so the training data can be streamed from disk in chunks of any size, on top of an existing model.
+
+        :param chunk: DataFrame with the columns <target_word, context_string, sense_class> without NaN values
+        :param update: boolean value - update the likelihood table? Can be skipped for all but the last chunk of a stream
+        """
+
+        if self.tokenCounts is None:
+            if self.classes:
+                raise ValueError("The model has no token counts and cannot be updated, train it again")
+            self.resetModel()
+
+        # CLASSES
+        # New classes are added in the order they are first seen
+        senses = chunk["sense_class"]
+        for class_name in senses.unique():
+            if class_name not in self.classIndex:
+                self.classIndex[class_name] = len(self.classes)
+                self.classes.append(class_name)
+        self.classCounts = self.classCounts.add(senses.value_counts(), fill_value = 0).astype(np.int64)
+
+        # The class sets of known target words are updated in place, and new target words are appended.
+        # They are sorted once by updateLikelihoods
+        newWords = {}
+        for word, classes in chunk.groupby("target_word", sort = False)["sense_class"].agg(set).items():
+            if word in self.wordClasses.index:
+                self.wordClasses.at[word] = self.wordClasses.at[word] | classes
+            else:
+                newWords[word] = classes
+        if newWords:
+            self.wordClasses = pd.concat([self.wordClasses, pd.Series(newWords, dtype = object)])
 
         # VOCABULARY
-        vocabulary = ""
-        for row in self.train.iterrows():
-            vocabulary += str(row[1]["context_string"]) + " "
-        vocabulary = vocabulary.strip().split(" ")
-        vocabulary = list(set(vocabulary))
+        # New words are appended, so the columns of the counts learned so far do not move. The vocabulary is sorted once by updateLikelihoods
+        contexts = chunk["context_string"].astype(str)
+        self.vocabulary.encode(pd.unique(np.array(" ".join(contexts).strip().split(" "), dtype = object)), add = True)
+        self.nVoc = len(self.vocabulary)
+        self.sentenceColumns = None
+
+        # TOKEN COUNTS
+        # Count how often each token of the vocabulary occurs in the contexts of each class
+        classRows = senses.map(self.classIndex).to_numpy(dtype = np.int64)
+        tokens = pd.DataFrame({"class": classRows, "token": contexts.str.split(" ").to_numpy()}).explode("token")
+        tokenColumns = self.vocabulary.encode(tokens["token"]).astype(np.int64)
+        tokens = tokens[tokenColumns >= 0]
+        oldCounts = self.tokenCounts.tocoo()
+        rows = np.concatenate([oldCounts.row.astype(np.int64), tokens["class"].to_numpy(dtype = np.int64)])
+        columns = np.concatenate([oldCounts.col.astype(np.int64), tokenColumns[tokenColumns >= 0]])
+        data = np.concatenate([oldCounts.data.astype(np.int64), np.ones(len(tokens), dtype = np.int64)])
+        self.tokenCounts = sparse.coo_matrix((data, (rows, columns)), shape = (len(self.classes), self.nVoc)).tocsr()
+        self.tokenCounts.sum_duplicates()
+
+        # Get total word count for each class: the length of all contexts of the class joined by spaces
+        contextLengths = np.zeros(len(self.classes))
+        contextLengths[:len(self.classWordCounts)] = np.asarray(self.classWordCounts) + 1
+        contextLengths += np.bincount(classRows, weights = contexts.str.len().to_numpy() + 1, minlength = len(self.classes))
+        self.classWordCounts = contextLengths - 1
+
+        if update:
+            self.updateLikelihoods()
+
+
+    def updateLikelihoods(self):
+        """
+        Calculate the apriori probabilities and the log likelihood table from the counts of the model.
+        """
 
-        self.vocabulary = vocabulary
-        self.nVoc = len(vocabulary)
+        self.sortModel()
 
         # APRIORI PROBABILITES
-        num_rows = self.train.shape[0]
+        num_rows = int(self.classCounts.sum())
+        self.aprioriProbabilites = []
         for class_name in self.classes:
             self.aprioriProbabilites.append(np.log(self.classCounts[class_name] / num_rows))
 
-        # PREPARE TRAINING DATASET
-        # Group by sense_class and join all context strings
-        self.train = self.train.drop(["target_word"], axis = 1).groupby(['sense_class'])['context_string'].apply(" ".join).reset_index()
-        
-        # Get total word count for each class
-        self.train["word_count"] = self.train["context_string"].apply(lambda x: len(x))
-        self.train = self.train.set_index("sense_class")
-    
+        # COUNT MATRIX
+        # A token can contain other words of the vocabulary, e.g. "20-year-old" contains "year"
+        self.wordCounts = (self.tokenCounts @ self.getTokenMatches(self.vocabulary)).tocsr()
+        self.wordCounts.sum_duplicates()
+        self.likelihoodDenominators = self.classWordCounts + self.alpha * self.nVoc
 
-    def getLikelihood(self, class_name, context_word):
+        # LOG LIKELIHOOD TABLE
+        # log((count + alpha) / denominator) = log(alpha / denominator) + log((count + alpha) / alpha), where the last term is zero for unseen words
+        self.unseenLikelihoods = np.log(self.alpha / self.likelihoodDenominators)
+        self.likelihoodGains = self.wordCounts.astype(np.float64)
+        self.likelihoodGains.data = np.log((self.likelihoodGains.data + self.alpha) / self.alpha)
+
+
+    def sortModel(self):
+        """
+        Sort the target words and the vocabulary added by partialFit, and move the columns of the token counts to the new positions of their words.
         """
-        Calculates the log likelihood of a word given the class 
 
-        :param class_name: sense class under investigation
-        :param context_word: word in context under investigation
-        :return: the log likelihood of a word given a class
-        """ 
+        if not self.wordClasses.index.is_monotonic_increasing:
+            self.wordClasses = self.wordClasses.sort_index()
+
+        order = sorted(range(len(self.vocabulary)), key = self.vocabulary.__getitem__)
+        if order != list(range(len(self.vocabulary))):
+            self.vocabulary = Vocabulary(self.vocabulary[index] for index in order)
+            self.tokenCounts = self.tokenCounts[:, order].tocsr()
+            self.tokenCounts.sort_indices()
+
+
+    @metrics.timed("naiveBayes.trainFromFile")
+    def trainFromFile(self, filePath = TRAINING_PATH, chunkSize = 100000):
+        """
+        Update the model with a training dataset streamed from disk, so memory use depends on the chunk size and the model size.
+        To add annotations to a saved model, load it with loadModel, call this method and save it again.
+
+        :param filePath: file path to a CSV file with the columns <target_word, context_string, sense_class>
+        :param chunkSize: number of rows read at a time
+        """
+
+        # The file is hashed before it is read, and recorded after training, since the first chunk of a new model resets the training files
+        fileHash = hashPath(filePath)
+        for chunk in pd.read_csv(filePath, chunksize = chunkSize):
+            self.partialFit(chunk.dropna(), update = False)
+        self.updateLikelihoods()
+        self.trainingFiles[filePath] = fileHash
+
+
+    @staticmethod
+    def getTokenMatches(vocabulary):
+        """
+        Find which words of the vocabulary match inside each token of the vocabulary as a whole word.
+        A word matches inside a token when the pattern \\b<word>\\b is found in the token.
+
+        :param vocabulary: Vocabulary of the words
+        :return: sparse matrix (token x word) with the number of matches of each word in each token
+        """
+
+        rows, columns = [], []
+        nonWords = []
+        for index, word in enumerate(vocabulary):
+            if re.fullmatch(r"\w+", word):
+                # A token of only word characters can only match itself
+                rows.append(index)
+                columns.append(index)
+            elif word:
+                nonWords.append(word)
+
+        # Tokens with other characters match each run of word characters and possibly other tokens
+        for token in nonWords:
+            tokenIndex = vocabulary.get(token)
+            for run in re.findall(r"\w+", token):
+                if run in vocabulary:
+                    rows.append(tokenIndex)
+                    columns.append(vocabulary.get(run))
+            for word in nonWords:
+                if word in token:
+                    matches = sum(1 for _ in re.finditer(r'\b%s\b' % re.escape(word), token))
+                    rows += [tokenIndex] * matches
+                    columns += [vocabulary.get(word)] * matches
+
+        return sparse.coo_matrix((np.ones(len(rows), dtype = np.int64), (rows, columns)), shape = (len(vocabulary), len(vocabulary))).tocsr()
+
+
+    @metrics.timed("naiveBayes.compressModel")
+    def compressModel(self, minCount = 1, maxVocabulary = None, buckets = None, dtype = np.float32):
+        """
+        Reduce the size of a trained model. Rare words are removed from the likelihood table, the remaining words
+        can be hashed into a fixed number of columns, and the log likelihoods are stored with a smaller float type.
+        The likelihood denominators of the exact model are kept, so the likelihoods of the kept words do not change.
+        The token and word counts are removed, so a compressed model cannot be updated with partialFit.
+
+        :param minCount: minimum frequency of a word over all classes to keep it
+        :param maxVocabulary: maximum number of words to keep, the most frequent ones, or None for no limit
+        :param buckets: number of hash buckets to map the words to, or None to keep one column per word.
+                        Any context word is then mapped to a bucket, including words that were not in the training dataset
+        :param dtype: float type of the stored log likelihoods
+        """
+
+        if self.wordCounts is None:
+            raise ValueError("The model has no word counts and cannot be compressed again")
+
+        # VOCABULARY PRUNING
+        # The kept words stay in vocabulary order, so the vocabulary stays sorted
+        totals = np.asarray(self.wordCounts.sum(axis = 0)).ravel()
+        kept = np.flatnonzero(totals >= minCount)
+        if maxVocabulary is not None and len(kept) > maxVocabulary:
+            kept = np.sort(kept[np.argsort(-totals[kept], kind = "stable")[:maxVocabulary]])
+        vocabulary = [self.vocabulary[index] for index in kept]
+        wordCounts = self.wordCounts[:, kept]
+
+        # FEATURE HASHING
+        # The counts of the words in a bucket are added, and the likelihood of the bucket is computed from the sum
+        if buckets is not None:
+            wordBuckets = self.getWordBuckets(vocabulary, buckets)
+            hashing = sparse.coo_matrix((np.ones(len(vocabulary), dtype = np.int64), (np.arange(len(vocabulary)), wordBuckets)), shape = (len(vocabulary), buckets)).tocsr()
+            wordCounts = (wordCounts @ hashing).tocsr()
+            wordCounts.sum_duplicates()
+            vocabulary = []
+
+        likelihoodGains = wordCounts.astype(np.float64)
+        likelihoodGains.data = np.log((likelihoodGains.data + self.alpha) / self.alpha)
+
+        self.vocabulary = Vocabulary(vocabulary)
+        self.buckets = buckets
+        self.nVoc = buckets if buckets is not None else len(vocabulary)
+        self.likelihoodGains = likelihoodGains.astype(dtype)
+        self.wordCounts = None
+        self.tokenCounts = None
+
+
+    @staticmethod
+    def getWordBuckets(words, buckets):
+        """
+        :param words: iterable of words
+        :param buckets: number of hash buckets
+        :return: array with the hash bucket of each word, the same in every process and run
+        """
+
+        return np.array([zlib.crc32(word.encode("utf-8")) % buckets for word in words], dtype = np.int64)
+
+
+    def getWordColumns(self, words):
+        """
+        :param words: iterable of words
+        :return: array with the column of each word in the likelihood table, or -1 for words that are not in the vocabulary
+        """
+
+        if self.buckets is not None:
+            return self.getWordBuckets(words, self.buckets)
+        return self.vocabulary.encode(words).astype(np.int64)
+
 
-        # Access all words in all contexts for a class that appeared in the training data
-        all_words_given_class = self.train.at[class_name, "context_string"]
+    def saveModel(self, directory = MODEL_DIRECTORY):
+        """
+        Save the trained model as .npy arrays that can be memory-mapped by loadModel.
+
+        :param directory: directory to write the model files to
+        """
+
+        # Possible classes of each target word, stored as a sparse row per word
+        targetWords = list(self.wordClasses.index)
+        wordClassIndices = [[self.classIndex[class_name] for class_name in self.wordClasses[word]] for word in targetWords]
+        wordClassIndptr = np.cumsum([0] + [len(indices) for indices in wordClassIndices])
+
+        # The word counts and the log likelihood gains have the same sparse structure
+        arrays = {
+            "classCounts": self.classCounts.reindex(self.classes).to_numpy(dtype = np.int64),
+            "aprioriProbabilites": np.asarray(self.aprioriProbabilites, dtype = np.float64),
+            "wordClassIndptr": wordClassIndptr.astype(np.int64),
+            "wordClassIndices": np.array([index for indices in wordClassIndices for index in indices], dtype = np.int64),
+            "wordCountsIndices": self.likelihoodGains.indices,
+            "wordCountsIndptr": self.likelihoodGains.indptr,
+            "likelihoodGainsData": self.likelihoodGains.data,
+            "classWordCounts": self.classWordCounts,
+            "likelihoodDenominators": self.likelihoodDenominators,
+            "unseenLikelihoods": self.unseenLikelihoods,
+        }
+
+        # Strings are packed as UTF-8 bytes, instead of fixed-width arrays as long as the longest string
+        arrays["vocabulary"], arrays["vocabularyOffsets"] = packStrings(self.vocabulary.tokens)
+        arrays["classes"], arrays["classesOffsets"] = packStrings(self.classes)
+        arrays["targetWords"], arrays["targetWordsOffsets"] = packStrings(targetWords)
+
+        # The word counts are removed by compressModel, and the token counts are needed to update the model with partialFit
+        if self.wordCounts is not None:
+            arrays["wordCountsData"] = self.wordCounts.data
+        if self.tokenCounts is not None:
+            arrays.update({"tokenCountsData": self.tokenCounts.data, "tokenCountsIndices": self.tokenCounts.indices, "tokenCountsIndptr": self.tokenCounts.indptr})
+        removedArrays = [name for name in ["wordCountsData", "tokenCountsData", "tokenCountsIndices", "tokenCountsIndptr"] if name not in arrays]
+
+        metadata = {"alpha": self.alpha, "nVoc": self.nVoc, "nClasses": len(self.classes), "buckets": self.buckets, "trainingFiles": self.trainingFiles}
+        saveArrays(directory, arrays, "model.json", metadata, removedArrays)
+        self.modelDirectory = directory
+
+
+    def loadModel(self, directory = MODEL_DIRECTORY):
+        """
+        Load a model saved by saveModel. The large arrays are memory-mapped read-only,
+        so processes that load the same model share its pages.
+
+        :param directory: directory to read the model files from
+        """
 
-        # Get frequency of word given class
-        word_count_given_class = sum(1 for _ in re.finditer(r'\b%s\b' % re.escape(context_word), all_words_given_class))
+        with open(os.path.join(directory, "model.json")) as file:
+            metadata = json.load(file)
+        self.modelDirectory = directory
+
+        def load(name):
+            return np.load(os.path.join(directory, name + ".npy"), mmap_mode = "r")
+
+        def loadStrings(name):
+            # Models saved before the strings were packed store them as fixed-width arrays
+            if not os.path.exists(os.path.join(directory, name + "Offsets.npy")):
+                return load(name).tolist()
+            return StringArray(load(name), load(name + "Offsets")).tolist()
+
+        self.alpha = metadata["alpha"]
+        self.nVoc = metadata["nVoc"]
+        self.buckets = metadata.get("buckets")
+        self.trainingFiles = metadata.get("trainingFiles", {})
+        shape = (metadata["nClasses"], self.nVoc)
+
+        self.vocabulary = Vocabulary(loadStrings("vocabulary"))
+        self.classes = loadStrings("classes")
+        self.classIndex = {class_name: index for index, class_name in enumerate(self.classes)}
+        self.classCounts = pd.Series(load("classCounts"), index = self.classes)
+        self.aprioriProbabilites = load("aprioriProbabilites")
+
+        wordClassIndptr = load("wordClassIndptr")
+        wordClassIndices = load("wordClassIndices")
+        self.wordClasses = pd.Series([{self.classes[index] for index in wordClassIndices[start:end]} for start, end in zip(wordClassIndptr[:-1], wordClassIndptr[1:])],
+                                     index = loadStrings("targetWords"), dtype = object)
+
+        self.tokenCounts = None
+        if os.path.exists(os.path.join(directory, "tokenCountsData.npy")):
+            self.tokenCounts = sparse.csr_matrix((load("tokenCountsData"), load("tokenCountsIndices"), load("tokenCountsIndptr")), shape = shape, copy = False)
+
+        indices, indptr = load("wordCountsIndices"), load("wordCountsIndptr")
+        self.wordCounts = None
+        if os.path.exists(os.path.join(directory, "wordCountsData.npy")):
+            self.wordCounts = sparse.csr_matrix((load("wordCountsData"), indices, indptr), shape = shape, copy = False)
+        self.likelihoodGains = sparse.csr_matrix((load("likelihoodGainsData"), indices, indptr), shape = shape, copy = False)
+        self.classWordCounts = load("classWordCounts")
+        self.likelihoodDenominators = load("likelihoodDenominators")
+        self.unseenLikelihoods = load("unseenLikelihoods")
+
+
+    @staticmethod
+    def hasModel(directory = MODEL_DIRECTORY):
+        """
+        Check if a complete model has been saved.
 
-        # Calulate log likelihood with smoothing
-        likelihood = np.log((word_count_given_class + self.alpha)/(self.train.at[class_name, "word_count"] + self.alpha * self.nVoc))
+        :param directory: directory of the model files
+        :return: boolean value - can the model be loaded?
+        """
+
+        return os.path.exists(os.path.join(directory, "model.json"))
+
+
+    @staticmethod
+    def isOutdated(directory = MODEL_DIRECTORY, filePath = TRAINING_PATH):
+        """
+        Check if a saved model has to be trained again, because it was not trained from the current content of the training dataset.
+        Models saved before the training datasets were recorded are outdated too. Without the training dataset, the model cannot be checked.
+
+        :param directory: directory of the model files
+        :param filePath: file path to the training dataset
+        :return: boolean value - does the training dataset differ from the one the model was trained from?
+        """
 
-        return likelihood
+        if not os.path.exists(filePath):
+            return False
+        with open(os.path.join(directory, "model.json")) as file:
+            trainingFiles = json.load(file).get("trainingFiles", {})
+        return trainingFiles.get(filePath) != hashPath(filePath)
+
+
+    @metrics.timed("naiveBayes.getLikelihoods")
+    def getLikelihoods(self, class_indices, word_indices):
+        """
+        Calculates the log likelihood of each word given each class
+
+        :param class_indices: rows of the sense classes under investigation
+        :param word_indices: columns of the words in context under investigation
+        :return: dense matrix (class x word) with the log likelihood of the words given the classes
+        """
+
+        likelihood_gains = self.likelihoodGains[class_indices][:, word_indices].toarray()
+        return likelihood_gains + self.unseenLikelihoods[class_indices, None]
 
 
     def classify(self, row): 
@@ -115,11 +494,11 @@ class NaiveBayesWSD:
         """ 
 
         word = row.target_word
-        context = row.context_string.split()       
         scores = []     # List of the likelihood of the possible senses for the word in context
 
         # If word to be classified does not exist in training data
         if not (word in self.wordClasses.index):
+            metrics.increment("naiveBayes.unknownWord")
             return "None"
 
         # Else if only one possible class
@@ -129,47 +508,138 @@ class NaiveBayesWSD:
 
         # Else choose class with highest probability given context
         # Perform calculations in log space to avoid underflow and increase speed
-        for class_name in self.wordClasses[word]:
-
-            # Get apriori probability of class
-            class_index = self.classes.index(class_name)
-            p_class_given_message = self.aprioriProbabilites[class_index]
-
-            # Get likelihood of word in context given class
-            for context_word in context:
-                if context_word in self.vocabulary:
-                    p_class_given_message += self.getLikelihood(class_name, context_word)                
+        class_names = list(self.wordClasses[word])
+        class_indices = [self.classIndex[class_name] for class_name in class_names]
+        if hasattr(row, "context_string"):
+            columns = self.getWordColumns(row.context_string.split())
+        else:
+            # Look up the token ids of the sentence, without joining and splitting the context
+            columns = self.getSentenceColumns()[self.sentences.contextIds(row.sentence, row.position)]
+        word_indices = columns[columns >= 0]
+        likelihoods = self.getLikelihoods(class_indices, word_indices)
+        metrics.increment("naiveBayes.scoredInstances")
+        metrics.increment("naiveBayes.scoredClasses", len(class_indices))
+
+        for class_name, class_index, class_likelihoods in zip(class_names, class_indices, likelihoods):
+
+            # Get apriori probability of class and add likelihood of words in context given class
+            p_class_given_message = sum(class_likelihoods, self.aprioriProbabilites[class_index])
             scores.append((class_name, p_class_given_message))
         return max(scores, key = itemgetter(1))[0]
                 
 
-    def runClassification(self):
+    def getContextMatrix(self, contexts):
         """
-        Classify all the words in the test datasets and save results to file.
+        Creates a bag-of-words matrix of the contexts over the vocabulary. Words not in the vocabulary are ignored.
+
+        :param contexts: Series of context strings
+        :return: sparse matrix (context x vocabulary) with the frequency of each word in each context
+        """
+
+        tokens = contexts.reset_index(drop = True).str.split().explode().dropna()
+        codes, words = pd.factorize(tokens)
+        columns = self.getWordColumns(words)[codes]
+        known = columns >= 0
+        rows = tokens.index.to_numpy(dtype = np.int64)
+        return sparse.coo_matrix((np.ones(int(known.sum())), (rows[known], columns[known])), shape = (len(contexts), self.nVoc)).tocsr()
+
+
+    def getSentenceColumns(self):
         """
+        Map the token ids of the sentences to the vocabulary, once for each SentenceStore and vocabulary.
 
-        self.semeval2007["predicted"] = self.semeval2007.apply(lambda row: self.classify(row), axis=1)
-        self.semeval2007 = self.semeval2007.drop(["target_word", "context_string"], axis = 1)
-        self.semeval2007.to_csv("results/naiveBayes/nb_semeval2007_predicted.txt", sep=' ', header = False, index = False)
+        :return: array with the vocabulary column of each token id of the SentenceStore, or -1
+        """
+
+        if self.sentenceColumns is None or self.sentenceColumns[0] is not self.sentences or self.sentenceColumns[1] is not self.vocabulary:
+            self.sentenceColumns = (self.sentences, self.vocabulary, self.getWordColumns(self.sentences.tokens))
+        return self.sentenceColumns[2]
+
+
+    def getSentenceContextMatrix(self, data):
+        """
+        Creates a bag-of-words matrix of the contexts of instances that refer to their sentence, without tokenizing any text.
+        Words not in the vocabulary are ignored.
+
+        :param data: DataFrame with the columns <sentence, position>
+        :return: sparse matrix (context x vocabulary) with the frequency of each word in each context
+        """
 
-        self.semeval2013["predicted"] = self.semeval2013.apply(lambda row: self.classify(row), axis=1)
-        self.semeval2013 = self.semeval2013.drop(["target_word", "context_string"], axis = 1)
-        self.semeval2013.to_csv("results/naiveBayes/nb_semeval2013_predicted.txt", sep=' ', header = False, index = False)
+        rows, tokens = self.sentences.instanceTokens(data["sentence"].to_numpy(), data["position"].to_numpy())
+        columns = self.getSentenceColumns()[tokens]
+        known = columns >= 0
+        return sparse.coo_matrix((np.ones(int(known.sum())), (rows[known], columns[known])), shape = (len(data), self.nVoc)).tocsr()
 
-        self.semeval2015["predicted"] = self.semeval2015.apply(lambda row: self.classify(row), axis=1)
-        self.semeval2015 = self.semeval2015.drop(["target_word", "context_string"], axis = 1)
-        self.semeval2015.to_csv("results/naiveBayes/nb_semeval2015_predicted.txt", sep=' ', header = False, index = False)
 
-        self.senseval2["predicted"] = self.senseval2.apply(lambda row: self.classify(row), axis=1)
-        self.senseval2 = self.senseval2.drop(["target_word", "context_string"], axis = 1)
-        self.senseval2.to_csv("results/naiveBayes/nb_senseval2_predicted.txt", sep=' ', header = False, index = False)
+    @metrics.timed("naiveBayes.classifyBatch")
+    def classifyBatch(self, data):
+        """
+        Classifies all the words in a dataset with a sense class.
+        The instances are grouped by target word, and the candidate classes of each group are scored with one sparse matrix product.
 
-        self.senseval3["predicted"] = self.senseval3.apply(lambda row: self.classify(row), axis=1)
-        self.senseval3 = self.senseval3.drop(["target_word", "context_string"], axis = 1)
-        self.senseval3.to_csv("results/naiveBayes/nb_senseval3_predicted.txt", sep=' ', header = False, index = False)
+        :param data: DataFrame with the columns <target_word, context_string> or <target_word, sentence, position>
+        :return: Series with the most likely class of each word, aligned with the index of data
+        """
+
+        predicted = pd.Series("None", index = data.index, dtype = object)
+
+        # Words that do not exist in training data keep "None"
+        known = data[data["target_word"].isin(self.wordClasses.index)]
+        metrics.increment("naiveBayes.unknownWord", len(data) - len(known))
+        if known.empty:
+            return predicted
+
+        # Words with only one possible class
+        classSets = known["target_word"].map(self.wordClasses)
+        single = classSets.map(len) == 1
+        predicted[single[single].index] = classSets[single].map(lambda classes: next(iter(classes)))
+
+        # Else choose class with highest probability given context
+        ambiguous = known[~single]
+        if "context_string" in ambiguous:
+            contextMatrix = self.getContextMatrix(ambiguous["context_string"])
+        else:
+            contextMatrix = self.getSentenceContextMatrix(ambiguous)
+        contextLengths = np.asarray(contextMatrix.sum(axis = 1)).ravel()
+        aprioriProbabilites = np.asarray(self.aprioriProbabilites)
 
-        self.allTest["predicted"] = self.allTest.apply(lambda row: self.classify(row), axis=1)
-        self.allTest = self.allTest.drop(["target_word", "context_string"], axis=1)
-        self.allTest.to_csv("results/naiveBayes/nb_allTest_predicted.txt", sep=' ', header=False, index=False)
+        for word, positions in ambiguous.groupby("target_word", sort = False).indices.items():
+            class_names = list(self.wordClasses[word])
+            class_indices = [self.classIndex[class_name] for class_name in class_names]
+
+            metrics.increment("naiveBayes.scoredInstances", len(positions))
+            metrics.increment("naiveBayes.scoredClasses", len(positions) * len(class_indices))
+            scores = contextMatrix[positions] @ self.likelihoodGains[class_indices].T
+            scores = np.asarray(scores.todense()) + np.outer(contextLengths[positions], self.unseenLikelihoods[class_indices]) + aprioriProbabilites[class_indices]
+            predicted[ambiguous.index[positions]] = np.asarray(class_names, dtype = object)[scores.argmax(axis = 1)]
+
+        return predicted
+
+
+    @classmethod
+    def fromModel(cls, directory = MODEL_DIRECTORY):
+        """
+        Create a classifier with the model loaded from file.
+
+        :param directory: directory to read the model files from
+        :return: NaiveBayesWSD ready to classify
+        """
+
+        naiveBayes = cls()
+        naiveBayes.loadModel(directory)
+        return naiveBayes
+
+
+    def runClassification(self, workers = 1, chunkSize = 1000):
+        """
+        Classify all the words in the test datasets and save results to file.
+
+        :param workers: number of worker processes
+        :param chunkSize: number of rows sent to a worker at a time
+        """
 
+        # Worker processes load the saved model, so a model trained in this process is saved first
+        if workers > 1 and self.modelDirectory is None:
+            self.saveModel()
 
+        super().runClassification(workers, chunkSize)
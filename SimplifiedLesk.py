@@ -1,42 +1,61 @@
 import pandas as pd
-from nltk.corpus import wordnet as wn
+import numpy as np
+import json
+import os
+import re
+from functools import partial
 from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
 from nltk.stem import WordNetLemmatizer
 from string import punctuation
+from preprocess import englishStopwords, FORBIDDEN_WORDS
+import metrics
+from baseClassifier import Classifier
+from wordnetSnapshot import loadSnapshot, SNAPSHOT_DIRECTORY
+from datasets import contextString, targetWords
+from vocabulary import packStrings, saveArrays, StringArray, Vocabulary
 
-class SimplifiedLesk:
+INDEX_PATH = "models/lesk/signatureIndex"
+RESULTS_PATH = "results/lesk/lesk_{}_predicted.txt"
+
+# Characters at which word_tokenize can split a text into sentences before tokenizing the words
+SENTENCE_END = re.compile(r"[.?!]")
+
+lemmatizer = WordNetLemmatizer()
+
+
+class SimplifiedLesk(Classifier):
+
+    resultsPath = RESULTS_PATH
 
     def __init__(self):
-        self.semeval2007 = None  # Test dataset
-        self.semeval2013 = None  # Test dataset
-        self.semeval2015 = None  # Test dataset
-        self.senseval2 = None  # Test dataset
-        self.senseval3 = None  # Test dataset
-        self.allTest = None  # All test datasets
+        super().__init__()
+
+        self.wordnet = None      # WordNetSnapshot with the synsets, sense keys and glosses
+        self.vocabulary = None      # Vocabulary of the signature tokens
+        self.postingIndptr = None   # Array with the start of the synsets of each token in postingSynsets and the end of the last one
+        self.postingSynsets = None  # Array with the synset ids whose signature contains each token, one token after the other
+        self.indexPath = INDEX_PATH  # File path to the signature index
+        self.tokenWords = None      # (sentences, vocabulary, signature token ids of the words of each stored token), see getTokenWords
 
 
-    def loadData(self):
+    def prepare(self):
+        """
+        Load the signature index, building it first if it does not exist.
         """
-        Load the test datasets, and remove rows with NaN values.
-        """ 
 
-        # Load the test datasets
-        semeval2007 = pd.read_csv("data/cleaned/semeval2007.csv")
-        semeval2013 = pd.read_csv("data/cleaned/semeval2013.csv")
-        semeval2015 = pd.read_csv("data/cleaned/semeval2015.csv")
-        senseval2 = pd.read_csv("data/cleaned/senseval2.csv")
-        senseval3 = pd.read_csv("data/cleaned/senseval3.csv")
-        allTest = pd.read_csv("data/cleaned/allTest.csv")
-
-        self.semeval2007 = semeval2007.dropna().reset_index(drop = True) 
-        self.semeval2013 = semeval2013.dropna().reset_index(drop = True)
-        self.semeval2015 = semeval2015.dropna().reset_index(drop = True) 
-        self.senseval2 = senseval2.dropna().reset_index(drop = True) 
-        self.senseval3 = senseval3.dropna().reset_index(drop = True)
-        self.allTest = allTest.dropna().reset_index(drop = True)
+        self.loadIndex(self.indexPath)
+
+
+    def getFactory(self):
+        """
+        :return: function without arguments that returns a classifier with the same signature index, for worker processes
+        """
+
+        return partial(SimplifiedLesk.fromIndex, self.indexPath)
+
 
     @staticmethod
+    @metrics.timed("lesk.preprocess")
     def preprocess(text):
         """
         Preprocess the text by tokenization, lemmatization, removing punctuation, stopwords, forbidden words and numbers, and converting to lowercase.
@@ -46,12 +65,11 @@ class SimplifiedLesk:
         """ 
 
         # Lemmatize, convert to lowercase and tokenize
-        lemmatizer = WordNetLemmatizer()
         tokens = word_tokenize(lemmatizer.lemmatize(text.lower()))
 
         # Remove stopwords, punctuation, forbidden words and numbers
-        forbidden_words =  ["&apos;", "``", "''", "'", "`", "'s"] 
-        tokens = [word for word in tokens if not word in stopwords.words('english') and not word in punctuation and not word in forbidden_words and not word.isnumeric()]
+        stopwordSet = englishStopwords()
+        tokens = [word for word in tokens if not word in stopwordSet and not word in punctuation and not word in FORBIDDEN_WORDS and not word.isnumeric()]
 
         # Remove duplicates
         tokens = list(set(tokens))
@@ -59,81 +77,188 @@ class SimplifiedLesk:
         return tokens
 
 
-    @staticmethod
-    def computeOverlap(signature, context):
+    def loadWordNet(self, directory = SNAPSHOT_DIRECTORY):
         """
-        Count words that occur in both lists
+        Load the WordNet snapshot. The snapshot is built first if it does not exist, including the target words of the loaded datasets.
 
-        :param signature: list of words of the glosses and examples of a synset
-        :param context: list of words in the context
-        :return: number of words in common
+        :param directory: directory of the snapshot files
         """
-        overlap = 0
-        for token in context:
-            if token in signature:
-                overlap += 1
-        return overlap
+
+        self.wordnet = loadSnapshot(directory, targetWords(self.testDatasets().values()))
+
+
+    def getSignature(self, synsetId):
+        """
+        Create the signature of a synset from its definition and examples.
+
+        :param synsetId: id of the synset in the WordNet snapshot
+        :return: processed signature as a list of words
+        """
+
+        signature = self.wordnet.definition(synsetId)
+        for example in self.wordnet.examples(synsetId):
+            signature += " " + example
+        return SimplifiedLesk.preprocess(signature)
+
+
+    def buildIndex(self):
+        """
+        Build the signature of every synset in WordNet, and an inverted index from signature tokens to synsets.
+        The index is stored as flat arrays: the synsets whose signature contains a token are
+        postingSynsets[postingIndptr[tokenId]:postingIndptr[tokenId + 1]], in increasing order.
+        """
+
+        self.vocabulary = Vocabulary()
+        postings = []
+
+        for synsetId in range(len(self.wordnet)):
+            signature = {self.vocabulary.add(token) for token in self.getSignature(synsetId)}
+            postings += [[] for _ in range(len(self.vocabulary) - len(postings))]
+            for tokenId in signature:
+                postings[tokenId].append(synsetId)
+
+        self.postingIndptr = np.zeros(len(postings) + 1, dtype = np.int64)
+        self.postingIndptr[1:] = np.cumsum([len(synsetIds) for synsetIds in postings])
+        self.postingSynsets = np.array([synsetId for synsetIds in postings for synsetId in synsetIds], dtype = np.int32)
+
+
+    def loadIndex(self, path = INDEX_PATH):
+        """
+        Load the signature index from file. The posting arrays are memory-mapped read-only, so worker processes that load
+        the same index share its pages. The index is built and saved first if it does not exist or was built from another WordNet version.
+
+        :param path: directory of the signature index
+        """
+
+        self.indexPath = path
+        if self.wordnet is None:
+            self.loadWordNet()
+        metadataPath = os.path.join(path, "index.json")
+        if os.path.exists(metadataPath):
+            with open(metadataPath) as file:
+                metadata = json.load(file)
+            if metadata["wordnetVersion"] == self.wordnet.version:
+                def load(name):
+                    return np.load(os.path.join(path, name + ".npy"), mmap_mode = "r")
+
+                self.vocabulary = Vocabulary(StringArray(load("tokens"), load("tokenOffsets")).tolist())
+                self.postingIndptr = load("postingIndptr")
+                self.postingSynsets = load("postingSynsets")
+                metrics.increment("lesk.indexCache.hit")
+                return
+
+        metrics.increment("lesk.indexCache.miss")
+        self.buildIndex()
+        arrays = {"postingIndptr": self.postingIndptr, "postingSynsets": self.postingSynsets}
+        arrays["tokens"], arrays["tokenOffsets"] = packStrings(self.vocabulary.tokens)
+        saveArrays(path, arrays, "index.json", {"wordnetVersion": self.wordnet.version})
+
+
+    @metrics.timed("lesk.computeOverlaps")
+    def computeOverlaps(self, candidates, contextIds):
+        """
+        Count the words in the context that occur in the signature of each candidate synset, in one pass over the context.
+
+        :param candidates: list of synset ids
+        :param contextIds: list with the signature token id of each word in the context, or -1 for words that are in no signature
+        :return: array with the number of words in common for each candidate
+        """
+
+        metrics.increment("lesk.candidates", len(candidates))
+        metrics.increment("lesk.contextTokens", len(contextIds))
+        contextIds = np.asarray(contextIds, dtype = np.int64)
+        contextIds = contextIds[contextIds >= 0]
+        hits = [self.postingSynsets[self.postingIndptr[tokenId]:self.postingIndptr[tokenId + 1]] for tokenId in contextIds.tolist()]
+        if not hits:
+            return np.zeros(len(candidates), dtype = np.int64)
+
+        # Match the synsets containing each context word with the distinct sorted candidates, and count the matches of each candidate
+        hits = np.concatenate(hits)
+        sortedCandidates, candidateIndex = np.unique(np.asarray(candidates, dtype = np.int64), return_inverse = True)
+        positions = np.minimum(np.searchsorted(sortedCandidates, hits), len(sortedCandidates) - 1)
+        matched = positions[sortedCandidates[positions] == hits]
+        return np.bincount(matched, minlength = len(sortedCandidates))[candidateIndex]
+
+
+    def getTokenWords(self):
+        """
+        Tokenize each token of the sentence store once, and look up its words in the signature vocabulary. Tokens with
+        sentence-ending punctuation are left out: word_tokenize splits a text into sentences at them first, so how
+        such a token is split depends on the rest of the context, e.g. "u.s." keeps its final period only inside a sentence.
+
+        :return: list with the signature token ids of the words of each stored token, or None for tokens with sentence-ending punctuation
+        """
+
+        if self.tokenWords is None or self.tokenWords[0] is not self.sentences or self.tokenWords[1] is not self.vocabulary:
+            words = [None if SENTENCE_END.search(token) else self.vocabulary.encode(word_tokenize(token)).tolist() for token in self.sentences.tokens]
+            self.tokenWords = (self.sentences, self.vocabulary, words)
+        return self.tokenWords[2]
+
+
+    def getContextIds(self, row):
+        """
+        Tokenize the context of an instance and look up the words in the signature vocabulary. The context of an instance
+        that refers to its sentence is built from the words of its stored tokens, see getTokenWords. If one of them has
+        sentence-ending punctuation, the context is joined into a string and tokenized like the context string of a CSV dataset.
+
+        :param row: contains <context_string> or <sentence, position>
+        :return: list with the signature token id of each word in the context, or -1
+        """
+
+        if not hasattr(row, "context_string"):
+            tokenWords = self.getTokenWords()
+            words = [tokenWords[tokenId] for tokenId in self.sentences.contextIds(row.sentence, row.position)]
+            if all(tokenIds is not None for tokenIds in words):
+                return [tokenId for tokenIds in words for tokenId in tokenIds]
+            metrics.increment("lesk.joinedContexts")
+        return self.vocabulary.encode(word_tokenize(contextString(row, self.sentences))).tolist()
 
 
     def classify(self, row):
         """
         Classifies a word with a sense class. 
 
-        :param row: contains <id, target_word, context_string>, 
+        :param row: contains <id, target_word, context_string> or <id, target_word, sentence, position>,
                     where target_word is the word to be classified and context_string is the context
         :return: the predicted sense class of the word
         """ 
 
         word = row.target_word
-        context =  word_tokenize(row.context_string)
-        synsets = wn.synsets(word)
+        context = self.getContextIds(row)
+        synsets = metrics.timedCall("wordnet.synsets", self.wordnet.synsets, word)
 
         if len(synsets) > 0:
-            bestSense = synsets[0].lemmas()[0].key()
-            maxOverlap = 0
-
-            for synset in synsets:
-
-                # Add definition and examples to signature
-                signature = synset.definition()
-                for example in synset.examples():
-                    signature += " " + example
-                signature = self.preprocess(signature)
-
-                # Find overlap between signature and context
-                overlap = self.computeOverlap(signature, context)
-                if overlap > maxOverlap:
-                    maxOverlap = overlap
-                    bestSense = synset.lemmas()[0].key()
+
+            # Find overlap between the signature of each synset and the context, and choose the first synset with the most overlap
+            overlaps = self.computeOverlaps(synsets, context)
+            bestSense = self.wordnet.senseKey(synsets[int(overlaps.argmax())])
             return bestSense
+        metrics.increment("lesk.unknownWord")
         return "None"
 
 
-    def runClassification(self):
+    def classifyBatch(self, data):
         """
-        Classify all the words in the test datasets and save results to file.
-        """ 
+        Classifies all the words in a dataset with a sense class.
 
-        self.semeval2007["predicted"] = self.semeval2007.apply(lambda row: self.classify(row), axis = 1)
-        self.semeval2007 = self.semeval2007.drop(["target_word", "context_string"], axis = 1)
-        self.semeval2007.to_csv("results/lesk/lesk_semeval2007_predicted.txt", sep = ' ', header = False, index = False)
+        :param data: DataFrame with the columns <id, target_word, context_string> or <id, target_word, sentence, position>
+        :return: Series with the predicted sense class of each word, aligned with the index of data
+        """
 
-        self.semeval2013["predicted"] = self.semeval2013.apply(lambda row: self.classify(row), axis = 1)
-        self.semeval2013 = self.semeval2013.drop(["target_word", "context_string"], axis = 1)
-        self.semeval2013.to_csv("results/lesk/lesk_semeval2013_predicted.txt", sep = ' ', header = False, index = False)
+        if data.empty:
+            return pd.Series([], index = data.index, dtype = object)
+        return data.apply(lambda row: self.classify(row), axis = 1)
 
-        self.semeval2015["predicted"] = self.semeval2015.apply(lambda row: self.classify(row), axis = 1)
-        self.semeval2015 = self.semeval2015.drop(["target_word", "context_string"], axis = 1)
-        self.semeval2015.to_csv("results/lesk/lesk_semeval2015_predicted.txt", sep = ' ', header = False, index = False)
 
-        self.senseval2["predicted"] = self.senseval2.apply(lambda row: self.classify(row), axis = 1)
-        self.senseval2 = self.senseval2.drop(["target_word", "context_string"], axis = 1)
-        self.senseval2.to_csv("results/lesk/lesk_senseval2_predicted.txt", sep = ' ', header = False, index = False)
+    @classmethod
+    def fromIndex(cls, path = INDEX_PATH):
+        """
+        Create a classifier with the signature index loaded from file.
 
-        self.senseval3["predicted"] = self.senseval3.apply(lambda row: self.classify(row), axis = 1)
-        self.senseval3 = self.senseval3.drop(["target_word", "context_string"], axis = 1)
-        self.senseval3.to_csv("results/lesk/lesk_senseval3_predicted.txt", sep = ' ', header = False, index = False)
+        :param path: file path to the signature index
+        :return: SimplifiedLesk ready to classify
+        """
 
-        self.allTest["predicted"] = self.allTest.apply(lambda row: self.classify(row), axis=1)
-        self.allTest = self.allTest.drop(["target_word", "context_string"], axis=1)
-        self.allTest.to_csv("results/lesk/lesk_allTest_predicted.txt", sep=' ', header=False, index=False)
\ No newline at end of file
+        simplifiedLesk = cls()
+        simplifiedLesk.loadIndex(path)
+        return simplifiedLesk
@@ -0,0 +1,82 @@
+import parallel
+from datasets import loadTestDatasets, ALL_TEST_DATASETS
+
+
+class Classifier:
+    """
+    Base class of the classifiers of the registered algorithms, see classifiers.ALGORITHMS. It holds the test datasets,
+    and classifies them and writes the results files with parallel.runClassification. A subclass sets resultsPath and implements:
+        prepare(): load the model, building and saving it first if it does not exist
+        getFactory(): function without arguments that returns a classifier with the same model, for worker processes
+        classify(row): predicted sense class of an instance
+        classifyBatch(data): predicted sense classes of a DataFrame of instances, aligned with its index
+    """
+
+    resultsPath = None  # File path of the results, with {} in place of the dataset name
+
+    def __init__(self):
+        self.semeval2007 = None  # Test dataset
+        self.semeval2013 = None  # Test dataset
+        self.semeval2015 = None  # Test dataset
+        self.senseval2 = None  # Test dataset
+        self.senseval3 = None  # Test dataset
+        self.allTest = None  # All test datasets
+        self.sentences = None    # SentenceStore the test datasets refer to, if they are stored with their sentences
+
+
+    def loadData(self):
+        """
+        Load the test datasets, and remove rows with NaN values.
+        """
+
+        self.setData(*loadTestDatasets())
+
+
+    def setData(self, datasets, sentences = None):
+        """
+        Use test datasets that are already loaded.
+
+        :param datasets: dictionary with key: dataset name, value: DataFrame
+        :param sentences: SentenceStore the datasets refer to, if they are stored with their sentences
+        """
+
+        self.sentences = sentences
+        for name, data in datasets.items():
+            setattr(self, name, data)
+
+
+    def testDatasets(self):
+        """
+        :return: dictionary with key: dataset name, value: DataFrame of the test dataset, or None if it is not loaded
+        """
+
+        return {name: getattr(self, name) for name in ALL_TEST_DATASETS}
+
+
+    def prepare(self):
+        raise NotImplementedError
+
+
+    def getFactory(self):
+        raise NotImplementedError
+
+
+    def classify(self, row):
+        raise NotImplementedError
+
+
+    def classifyBatch(self, data):
+        raise NotImplementedError
+
+
+    def runClassification(self, workers = 1, chunkSize = 1000):
+        """
+        Classify all the words in the test datasets and save results to file.
+
+        :param workers: number of worker processes
+        :param chunkSize: number of rows sent to a worker at a time
+        """
+
+        results = parallel.runClassification(self, self.getFactory(), self.testDatasets(), self.resultsPath, workers, chunkSize, self.sentences)
+        for name, data in results.items():
+            setattr(self, name, data)
@@ -0,0 +1,472 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+from xml.sax.saxutils import quoteattr, escape
+from preprocess import preprocess, outputPath
+from SimplifiedLesk import SimplifiedLesk
+from NaiveBayesWSD import NaiveBayesWSD
+from MostFrequentSense import MostFrequentSense
+from datasets import GOLD_KEY_FILES
+from main import DATA
+import scorer
+
+BENCHMARK_PATH = "results/benchmark/benchmark.json"
+
+# Directories whose files are linked into the workspace of a benchmark, which reads them but does not write to them
+MODEL_DIRECTORY = "models"
+ORIGINAL_DIRECTORY = "data/original"
+CLEANED_DIRECTORY = "data/cleaned"
+
+# Directory of the models and the results of benchmarkCompression
+COMPRESSION_DIRECTORY = "results/compression"
+
+# Arguments of NaiveBayesWSD.compressModel for each compressed model compared with the exact model
+COMPRESSION_SETTINGS = {
+    "minCount2": {"minCount": 2},
+    "minCount5": {"minCount": 5},
+    "top20000": {"maxVocabulary": 20000},
+    "hash65536": {"buckets": 2**16},
+    "hash16384": {"buckets": 2**14},
+    "minCount2Hash16384": {"minCount": 2, "buckets": 2**14},
+}
+
+# Stages faster than this are too noisy to compare with the baseline
+MINIMUM_COMPARED_SECONDS = 0.05
+
+
+def readStatus(field):
+    """
+    :param field: field of /proc/self/status with a size in kilobytes, e.g. VmRSS
+    :return: the size in megabytes
+    """
+
+    with open("/proc/self/status") as file:
+        for line in file:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+
+
+def startPeakMemory():
+    """
+    Start measuring the peak memory use of a stage. On Linux the peak resident set size of this process is reset,
+    elsewhere the allocations of Python and numpy are traced with tracemalloc. The memory of worker processes is not included.
+
+    :return: memory in use at the start of the stage in megabytes
+    """
+
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+        return readStatus("VmRSS")
+    except OSError:
+        tracemalloc.start()
+        return 0
+
+
+def peakMemory(start):
+    """
+    Get the peak memory use since startPeakMemory, above the memory in use when it was called.
+
+    :param start: memory in use at the start of the stage, as returned by startPeakMemory
+    :return: peak memory use in megabytes
+    """
+
+    if tracemalloc.is_tracing():
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak / 2**20 - start
+    return readStatus("VmHWM") - start
+
+
+@contextmanager
+def workspace(preprocessed = ()):
+    """
+    Run a benchmark in a temporary working directory, so the cleaned datasets, results files and synthetic corpora it writes
+    do not replace the files of the repository. The original datasets, the models and the cleaned datasets that are not
+    preprocessed again are linked into it. The directory is removed afterwards.
+
+    :param preprocessed: names of the datasets that are preprocessed in the workspace, whose cleaned datasets are not linked
+    """
+
+    root = os.getcwd()
+    directory = tempfile.mkdtemp(prefix = "wsd-benchmark-")
+    os.makedirs(os.path.join(root, MODEL_DIRECTORY), exist_ok = True)
+    os.symlink(os.path.join(root, MODEL_DIRECTORY), os.path.join(directory, MODEL_DIRECTORY))
+    excluded = {outputPath(name, grouped) for name in preprocessed for grouped in (False, True)}
+    for linkedDirectory in [ORIGINAL_DIRECTORY, CLEANED_DIRECTORY]:
+        os.makedirs(os.path.join(directory, linkedDirectory))
+        if not os.path.isdir(os.path.join(root, linkedDirectory)):
+            continue
+        for name in os.listdir(os.path.join(root, linkedDirectory)):
+            if linkedDirectory + "/" + name not in excluded:
+                os.symlink(os.path.join(root, linkedDirectory, name), os.path.join(directory, linkedDirectory, name))
+
+    os.chdir(directory)
+    try:
+        yield directory
+    finally:
+        os.chdir(root)
+        shutil.rmtree(directory)
+
+
+def measure(function, instances = None):
+    """
+    Run a stage and measure its wall-clock time and its peak memory use, see startPeakMemory.
+
+    :param function: function without arguments that runs the stage
+    :param instances: number of instances processed by the stage, if known before running it
+    :return: tuple of the result of the function, and a dictionary with the measurements
+    """
+
+    memory = startPeakMemory()
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+
+    measurements = {"seconds": seconds, "peakMemoryMb": peakMemory(memory)}
+    if instances is not None:
+        measurements["instances"] = instances
+        measurements["instancesPerSecond"] = instances / seconds if seconds > 0 else None
+    return result, measurements
+
+
+def measureLatency(classifier, data, sampleSize, seed = 0):
+    """
+    Measure the latency of classifying single instances.
+
+    :param classifier: classifier with a classify method
+    :param data: DataFrame with the columns <id, target_word, context_string>
+    :param sampleSize: number of instances to classify
+    :param seed: seed of the sample
+    :return: dictionary with the median and 99th percentile latency in milliseconds
+    """
+
+    sample = data.sample(min(sampleSize, len(data)), random_state = seed)
+    latencies = []
+    for row in sample.itertuples(index = False):
+        start = time.perf_counter()
+        classifier.classify(row)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    if not latencies:
+        return {}
+    return {"latencyP50Ms": float(np.percentile(latencies, 50)), "latencyP99Ms": float(np.percentile(latencies, 99))}
+
+
+def countRows(name):
+    """
+    Count the rows of a cleaned dataset.
+
+    :param name: dataset file name
+    :return: number of rows
+    """
+
+    filePath = outputPath(name, False)
+    if os.path.isdir(outputPath(name, True)):
+        filePath = os.path.join(outputPath(name, True), "instances.csv")
+    with open(filePath, "rb") as file:
+        return sum(1 for _ in file) - 1
+
+
+def benchmarkPreprocess(datasets, stages):
+    """
+    Measure the preprocessing of each dataset.
+
+    :param datasets: list of dictionaries with the keys <name, goldKeyFp, xmlFp, isTrainingSet>
+    :param stages: dictionary to add the measurements to
+    """
+
+    for dataset in datasets:
+        if not os.path.exists(dataset["xmlFp"]):
+            print("Skipping ", dataset["name"], ": ", dataset["xmlFp"], " not found")
+            continue
+        _, measurements = measure(lambda: preprocess(dataset["name"], dataset["goldKeyFp"], dataset["xmlFp"], dataset["isTrainingSet"], streaming = True))
+        measurements["instances"] = countRows(dataset["name"])
+        measurements["instancesPerSecond"] = measurements["instances"] / measurements["seconds"]
+        stages["preprocess/" + dataset["name"]] = measurements
+
+
+def benchmarkClassifier(name, classifier, stages, latencySample):
+    """
+    Measure the classification of each test dataset with a classifier, and the full runClassification.
+
+    :param name: name of the classifier in the stage names
+    :param classifier: classifier with the test datasets loaded and ready to classify
+    :param stages: dictionary to add the measurements to
+    :param latencySample: number of instances to measure the single instance latency on
+    :return: dictionary with key: dataset name, value: DataFrame of the test dataset, as loaded before runClassification replaced it with the results
+    """
+
+    testDatasets = classifier.testDatasets()
+    for datasetName, data in testDatasets.items():
+        _, measurements = measure(lambda: classifier.classifyBatch(data), len(data))
+        measurements.update(measureLatency(classifier, data, latencySample))
+        stages["classify/" + name + "/" + datasetName] = measurements
+
+    _, measurements = measure(classifier.runClassification, sum(len(data) for data in testDatasets.values()))
+    stages["runClassification/" + name] = measurements
+    return testDatasets
+
+
+def directorySize(directory):
+    """
+    :param directory: path to a directory
+    :return: total size of the files in the directory in megabytes
+    """
+
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(directory) for name in names) / 2**20
+
+
+def benchmarkCompression(naiveBayes, testDatasets, stages, settings = COMPRESSION_SETTINGS, directory = COMPRESSION_DIRECTORY):
+    """
+    Compress a trained Naive Bayes model with each setting, and measure the size of the saved model,
+    the classification time and the F1-score on the test datasets compared with the exact model.
+
+    :param naiveBayes: NaiveBayesWSD with a trained model
+    :param testDatasets: dictionary with key: dataset name, value: DataFrame of the test dataset, as returned by benchmarkClassifier
+    :param stages: dictionary to add the measurements to
+    :param settings: dictionary with key: name of the compressed model, value: dictionary with the arguments of compressModel
+    :param directory: directory to write the models and their results to
+    """
+
+    exactDirectory = os.path.join(directory, "exact", "model")
+    naiveBayes.saveModel(exactDirectory)
+
+    results = []
+    measurements = {}
+    for name, arguments in [("exact", None)] + list(settings.items()):
+        model = NaiveBayesWSD.fromModel(exactDirectory)
+        model.sentences = naiveBayes.sentences
+        if arguments is not None:
+            model.compressModel(**arguments)
+            model.saveModel(os.path.join(directory, name, "model"))
+
+        seconds = 0
+        peak = 0
+        for datasetName, data in testDatasets.items():
+            predicted, classifyMeasurements = measure(lambda: model.classifyBatch(data), len(data))
+            seconds += classifyMeasurements["seconds"]
+            peak = max(peak, classifyMeasurements["peakMemoryMb"])
+            filePath = os.path.join(directory, name, "nb_" + datasetName + "_predicted.txt")
+            pd.DataFrame({"id": data["id"].to_numpy(), "predicted": predicted.to_numpy()}).to_csv(filePath, sep = ' ', header = False, index = False)
+            results.append((name, datasetName, filePath))
+        measurements[name] = {"seconds": seconds, "peakMemoryMb": peak, "modelMb": directorySize(os.path.join(directory, name, "model"))}
+
+    f1 = scorer.score(results).pivot(index = "system", columns = "dataset", values = "f1")
+    for name, modelMeasurements in measurements.items():
+        modelMeasurements["f1"] = f1.loc[name].to_dict()
+        modelMeasurements["f1Change"] = (f1.loc[name] - f1.loc["exact"]).to_dict()
+        stages["compression/naiveBayes/" + name] = modelMeasurements
+
+
+def benchmark(latencySample = 200, includePreprocess = True, datasets = DATA, compression = False):
+    """
+    Measure preprocessing, training and classification on the bundled datasets, in a temporary working directory, see workspace.
+
+    :param latencySample: number of instances to measure the single instance latency on
+    :param includePreprocess: boolean value - measure preprocessing of the XML files?
+    :param datasets: list of dictionaries with the keys <name, goldKeyFp, xmlFp, isTrainingSet> to preprocess
+    :param compression: boolean value - compare compressed Naive Bayes models with the exact model, see benchmarkCompression?
+    :return: dictionary with the measurements of each stage
+    """
+
+    stages = {}
+    compressionDirectory = os.path.abspath(COMPRESSION_DIRECTORY)
+    with workspace([dataset["name"] for dataset in datasets] if includePreprocess else []):
+        if includePreprocess:
+            benchmarkPreprocess(datasets, stages)
+
+        simplifiedLesk = SimplifiedLesk()
+        simplifiedLesk.loadData()
+        _, stages["loadIndex/lesk"] = measure(simplifiedLesk.loadIndex)
+        benchmarkClassifier("lesk", simplifiedLesk, stages, latencySample)
+
+        if os.path.exists("data/cleaned/semcor.csv"):
+            naiveBayes = NaiveBayesWSD()
+            naiveBayes.loadData()
+            _, stages["trainModel/naiveBayes"] = measure(naiveBayes.trainModel, len(naiveBayes.train))
+            testDatasets = benchmarkClassifier("naiveBayes", naiveBayes, stages, latencySample)
+            if compression:
+                benchmarkCompression(naiveBayes, testDatasets, stages, directory = compressionDirectory)
+        else:
+            print("Skipping Naive Bayes: data/cleaned/semcor.csv not found")
+
+        mostFrequentSense = MostFrequentSense()
+        mostFrequentSense.loadData()
+        _, stages["loadTable/mostFreq"] = measure(mostFrequentSense.loadTable)
+        benchmarkClassifier("mostFreq", mostFrequentSense, stages, latencySample)
+
+    return stages
+
+
+def readSenseInventory(xmlFilePath, goldKeyFilePath):
+    """
+    Read the words of a corpus and the gold senses of its instances, to sample synthetic sentences from.
+
+    :param xmlFilePath: file path to the XML file
+    :param goldKeyFilePath: file path to the gold key file
+    :return: tuple of a list of (lemma, pos, is instance) tuples, and a dictionary with key: lemma, value: list of senses
+    """
+
+    gold = {}
+    with open(goldKeyFilePath) as file:
+        for line in file:
+            fields = line.split()
+            if len(fields) >= 2:
+                gold[fields[0]] = fields[1]
+
+    words = []
+    senses = {}
+    for _, element in ET.iterparse(xmlFilePath):
+        if element.tag in ("wf", "instance"):
+            lemma = element.attrib["lemma"]
+            isInstance = element.tag == "instance" and element.attrib["id"] in gold
+            words.append((lemma, element.attrib["pos"], isInstance))
+            if isInstance:
+                senses.setdefault(lemma, []).append(gold[element.attrib["id"]])
+    return words, senses
+
+
+def generateSyntheticCorpus(name, sentences, sentenceLength = 25, sentencesPerText = 50, seed = 0,
+                            xmlFilePath = "data/original/allTest/ALL.data.xml", goldKeyFilePath = GOLD_KEY_FILES["allTest"]):
+    """
+    Generate a corpus in the format of the evaluation framework by sampling words and senses from an existing corpus.
+
+    :param name: name of the corpus, the files are written to data/original/<name>/ in the working directory
+    :param sentences: number of sentences
+    :param sentenceLength: number of words in a sentence
+    :param sentencesPerText: number of sentences in a text
+    :param seed: seed of the random generator
+    :param xmlFilePath: file path to the XML file of the corpus to sample from
+    :param goldKeyFilePath: file path to the gold key file of the corpus to sample from
+    :return: dictionary with the keys <name, goldKeyFp, xmlFp, isTrainingSet> of the generated corpus
+    """
+
+    words, senses = readSenseInventory(xmlFilePath, goldKeyFilePath)
+    generator = random.Random(seed)
+
+    directory = "data/original/" + name
+    os.makedirs(directory, exist_ok = True)
+    dataset = {"name": name, "goldKeyFp": directory + "/" + name + ".gold.key.txt", "xmlFp": directory + "/" + name + ".data.xml", "isTrainingSet": True}
+
+    with open(dataset["xmlFp"], "w", encoding = "utf-8") as xml, open(dataset["goldKeyFp"], "w", encoding = "utf-8") as gold:
+        xml.write('<?xml version="1.0" encoding="UTF-8" ?>\n<corpus lang="en" source=%s>\n' % quoteattr(name))
+        for sentenceIndex in range(sentences):
+            textIndex, sentenceInText = divmod(sentenceIndex, sentencesPerText)
+            textId = "d%06d" % textIndex
+            if sentenceInText == 0:
+                if sentenceIndex > 0:
+                    xml.write("</text>\n")
+                xml.write('<text id="%s">\n' % textId)
+
+            sentenceId = "%s.s%03d" % (textId, sentenceInText)
+            xml.write('<sentence id="%s">\n' % sentenceId)
+            instanceIndex = 0
+            for lemma, pos, isInstance in generator.choices(words, k = sentenceLength):
+                if isInstance:
+                    instanceId = "%s.t%03d" % (sentenceId, instanceIndex)
+                    instanceIndex += 1
+                    xml.write('<instance id="%s" lemma=%s pos="%s">%s</instance>\n' % (instanceId, quoteattr(lemma), pos, escape(lemma)))
+                    gold.write(instanceId + " " + generator.choice(senses[lemma]) + "\n")
+                else:
+                    xml.write('<wf lemma=%s pos="%s">%s</wf>\n' % (quoteattr(lemma), pos, escape(lemma)))
+            xml.write("</sentence>\n")
+        if sentences > 0:
+            xml.write("</text>\n")
+        xml.write("</corpus>\n")
+
+    return dataset
+
+
+def benchmarkSynthetic(sentences, stages, latencySample, name = "synthetic"):
+    """
+    Measure preprocessing, training and Naive Bayes classification on a synthetic corpus, in a temporary working directory, see workspace.
+
+    :param sentences: number of sentences in the synthetic corpus
+    :param stages: dictionary to add the measurements to
+    :param latencySample: number of instances to measure the single instance latency on
+    :param name: name of the synthetic corpus
+    """
+
+    with workspace([name]):
+        dataset = generateSyntheticCorpus(name, sentences)
+        benchmarkPreprocess([dataset], stages)
+
+        naiveBayes = NaiveBayesWSD()
+        naiveBayes.train = pd.read_csv("data/cleaned/" + name + ".csv").dropna().reset_index(drop = True)
+        _, stages["trainModel/naiveBayes/" + name] = measure(naiveBayes.trainModel, len(naiveBayes.train))
+
+        data = naiveBayes.train.drop(["sense_class"], axis = 1)
+        _, measurements = measure(lambda: naiveBayes.classifyBatch(data), len(data))
+        measurements.update(measureLatency(naiveBayes, data, latencySample))
+        stages["classify/naiveBayes/" + name] = measurements
+
+
+def compare(stages, baseline, tolerance):
+    """
+    Compare the measurements with a baseline and find the stages that got slower.
+
+    :param stages: dictionary with the measurements of each stage
+    :param baseline: dictionary with the measurements of each stage in the baseline
+    :param tolerance: allowed relative slowdown, e.g. 0.2 for 20%
+    :return: list of (stage, baseline seconds, seconds) tuples of the stages that got slower
+    """
+
+    slowdowns = []
+    for stage, measurements in stages.items():
+        if stage not in baseline or baseline[stage]["seconds"] < MINIMUM_COMPARED_SECONDS:
+            continue
+        if measurements["seconds"] > baseline[stage]["seconds"] * (1 + tolerance):
+            slowdowns.append((stage, baseline[stage]["seconds"], measurements["seconds"]))
+    return slowdowns
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmark the word sense disambiguation pipeline.")
+    parser.add_argument("--output", default = BENCHMARK_PATH, help = "file path to write the measurements to")
+    parser.add_argument("--baseline", help = "file path to measurements to compare with")
+    parser.add_argument("--tolerance", type = float, default = 0.2, help = "allowed relative slowdown compared with the baseline")
+    parser.add_argument("--latency-sample", type = int, default = 200, help = "number of instances to measure the single instance latency on")
+    parser.add_argument("--skip-preprocess", action = "store_true", help = "do not measure preprocessing of the XML files")
+    parser.add_argument("--synthetic-sentences", type = int, default = 0, help = "also measure a synthetic corpus with this many sentences")
+    parser.add_argument("--compression", action = "store_true", help = "also compare compressed Naive Bayes models with the exact model")
+    arguments = parser.parse_args()
+
+    stages = benchmark(arguments.latency_sample, not arguments.skip_preprocess, compression = arguments.compression)
+    if arguments.synthetic_sentences > 0:
+        benchmarkSynthetic(arguments.synthetic_sentences, stages, arguments.latency_sample)
+
+    report = {"environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()}, "stages": stages}
+    os.makedirs(os.path.dirname(arguments.output) or ".", exist_ok = True)
+    with open(arguments.output, "w") as file:
+        json.dump(report, file, indent = 2)
+
+    for stage, measurements in stages.items():
+        print(stage.ljust(45), "%.3f s" % measurements["seconds"], "peak +%.0f MB" % measurements["peakMemoryMb"])
+        if "modelMb" in measurements:
+            print("".ljust(45), "model %.1f MB" % measurements["modelMb"], "F1 ALL %.1f" % (measurements["f1"]["allTest"] * 100),
+                  "(%+.1f)" % (measurements["f1Change"]["allTest"] * 100))
+
+    if arguments.baseline:
+        with open(arguments.baseline) as file:
+            baseline = json.load(file)["stages"]
+        slowdowns = compare(stages, baseline, arguments.tolerance)
+        for stage, baselineSeconds, seconds in slowdowns:
+            print("Slowdown in ", stage, ": %.3f s -> %.3f s" % (baselineSeconds, seconds))
+        if slowdowns:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
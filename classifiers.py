@@ -0,0 +1,148 @@
+import argparse
+from functools import partial
+import numpy as np
+import pandas as pd
+import parallel
+from datasets import loadTestDatasets, sentenceDatasets
+from baseClassifier import Classifier
+from SimplifiedLesk import SimplifiedLesk, RESULTS_PATH as LESK_RESULTS_PATH
+from NaiveBayesWSD import NaiveBayesWSD, RESULTS_PATH as NAIVE_BAYES_RESULTS_PATH
+from MostFrequentSense import MostFrequentSense, RESULTS_PATH as MOST_FREQUENT_SENSE_RESULTS_PATH
+
+# Classifier class and results file path, with {} in place of the dataset name, of each registered algorithm.
+# A classifier class is a subclass of Classifier
+ALGORITHMS = {
+    "lesk": (SimplifiedLesk, LESK_RESULTS_PATH),
+    "naiveBayes": (NaiveBayesWSD, NAIVE_BAYES_RESULTS_PATH),
+    "mostFreq": (MostFrequentSense, MOST_FREQUENT_SENSE_RESULTS_PATH),
+}
+
+
+def registerAlgorithm(name, classifierClass, outputFilePath):
+    """
+    Register an algorithm, so the runners can classify with it.
+
+    :param name: algorithm name
+    :param classifierClass: subclass of Classifier with a constructor without arguments
+    :param outputFilePath: file path of the results, with {} in place of the dataset name
+    """
+
+    ALGORITHMS[name] = (classifierClass, outputFilePath)
+
+
+def createClassifier(algorithm, datasets = None, sentences = None):
+    """
+    Create the classifier of a registered algorithm and load its model.
+
+    :param algorithm: algorithm name, a key of ALGORITHMS
+    :param datasets: dictionary with key: dataset name, value: DataFrame of the loaded test datasets, used to build a model that does not exist yet
+    :param sentences: SentenceStore the datasets refer to, if they are stored with their sentences
+    :return: classifier ready to classify
+    """
+
+    classifier = ALGORITHMS[algorithm][0]()
+    if datasets is not None:
+        classifier.setData(datasets, sentences)
+    classifier.prepare()
+    return classifier
+
+
+class CombinedClassifier:
+    """
+    Classifies instances with several classifiers, instances of Classifier, in the same pass. It has the getFactory, classify
+    and classifyBatch methods and the sentences attribute of a Classifier, with a tuple of the predictions of the classifiers for each instance.
+    """
+
+    def __init__(self, classifiers):
+        self.classifiers = classifiers  # Dictionary with key: algorithm name, value: classifier
+
+
+    @property
+    def sentences(self):
+        return next(iter(self.classifiers.values())).sentences
+
+
+    @sentences.setter
+    def sentences(self, sentences):
+        for classifier in self.classifiers.values():
+            classifier.sentences = sentences
+
+
+    def classify(self, row):
+        """
+        :param row: an instance
+        :return: tuple with the predicted sense class of each classifier
+        """
+
+        return tuple(classifier.classify(row) for classifier in self.classifiers.values())
+
+
+    def classifyBatch(self, data):
+        """
+        :param data: DataFrame with the columns <id, target_word, context_string> or <id, target_word, pos, sentence, position>
+        :return: Series with a tuple of the predicted sense class of each classifier for each instance, aligned with the index of data
+        """
+
+        predicted = [list(classifier.classifyBatch(data)) for classifier in self.classifiers.values()]
+        return pd.Series(list(zip(*predicted)), index = data.index, dtype = object)
+
+
+    def getFactory(self):
+        """
+        :return: function without arguments that returns a combined classifier with the same models, for worker processes
+        """
+
+        return partial(CombinedClassifier.fromFactories, {algorithm: classifier.getFactory() for algorithm, classifier in self.classifiers.items()})
+
+
+    @classmethod
+    def fromFactories(cls, factories):
+        """
+        :param factories: dictionary with key: algorithm name, value: function without arguments that returns a classifier ready to classify
+        :return: CombinedClassifier of the classifiers
+        """
+
+        return cls({algorithm: factory() for algorithm, factory in factories.items()})
+
+
+def runAlgorithms(algorithms = None, workers = 1, chunkSize = 1000):
+    """
+    Classify the test datasets with several algorithms in one pass and save the results files of each algorithm.
+    The datasets are loaded once and their contexts are stored once, in a SentenceStore shared by all the classifiers.
+    The context string of an instance of a CSV dataset is its sentence joined with spaces, so Lesk tokenizes it exactly like the CSV row.
+    Each distinct instance is classified once, and each chunk of instances is classified by all the algorithms in the same task.
+
+    :param algorithms: list of algorithm names, keys of ALGORITHMS, or None for all the registered algorithms
+    :param workers: number of worker processes
+    :param chunkSize: number of rows sent to a worker at a time
+    :return: dictionary with key: algorithm name, value: dictionary with key: dataset name, value: DataFrame with the columns <id, predicted>
+    """
+
+    if algorithms is None:
+        algorithms = list(ALGORITHMS)
+
+    datasets, sentences = loadTestDatasets()
+    if sentences is None:
+        datasets, sentences = sentenceDatasets(datasets)
+
+    classifier = CombinedClassifier({algorithm: createClassifier(algorithm, datasets, sentences) for algorithm in algorithms})
+    predicted, positions = parallel.classifyInstances(classifier, classifier.getFactory(), datasets, workers, chunkSize, sentences)
+
+    results = {}
+    for index, algorithm in enumerate(algorithms):
+        algorithmPredicted = np.array([instancePredicted[index] for instancePredicted in predicted], dtype = object)
+        results[algorithm] = parallel.writeResults(datasets, algorithmPredicted, positions, ALGORITHMS[algorithm][1])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Classify the test datasets with several algorithms in one pass.")
+    parser.add_argument("--algorithms", nargs = "+", default = list(ALGORITHMS), choices = list(ALGORITHMS))
+    parser.add_argument("--workers", type = int, default = 1, help = "number of worker processes")
+    parser.add_argument("--chunk-size", type = int, default = 1000, help = "number of rows sent to a worker at a time")
+    arguments = parser.parse_args()
+    runAlgorithms(arguments.algorithms, arguments.workers, arguments.chunk_size)
+
+
+if __name__ == '__main__':
+    main()
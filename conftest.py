@@ -0,0 +1,70 @@
+import os
+import shutil
+import pytest
+import nltk
+import preprocess
+from baseClassifier import Classifier
+from datasets import ALL_TEST_DATASETS
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Stopwords used instead of the NLTK corpus by tests that do not need the real list
+STOPWORDS = ["the", "a", "an", "and", "of", "is"]
+
+
+def requireNltkData(resources = ("corpora/wordnet", "corpora/stopwords", "tokenizers/punkt")):
+    for resource in resources:
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            pytest.skip("NLTK resource " + resource + " is not installed")
+
+
+class StubClassifier(Classifier):
+    """
+    Predicts the first sense of the target word, and raises after failAfter batches to interrupt a run.
+    """
+
+    def __init__(self, failAfter = None):
+        super().__init__()
+        self.failAfter = failAfter  # Number of batches classified before raising, or None
+        self.batches = 0            # Number of batches classified
+
+
+    def classifyBatch(self, data):
+        if self.batches == self.failAfter:
+            raise RuntimeError("interrupted")
+        self.batches += 1
+        return data["target_word"] + "%1:00:00::"
+
+
+class StubStopwords:
+
+    def words(self, language):
+        return STOPWORDS
+
+
+@pytest.fixture
+def stubStopwords(monkeypatch):
+    """
+    Replace the NLTK stopwords corpus with STOPWORDS, so preprocessing runs without the NLTK data.
+    """
+
+    monkeypatch.setattr(preprocess, "stopwords", StubStopwords())
+    preprocess.englishStopwords.cache_clear()
+    yield STOPWORDS
+    preprocess.englishStopwords.cache_clear()
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """
+    Working directory with the original and CSV test datasets of the repository, so the files written by a test go to a temporary directory.
+    """
+
+    os.makedirs(tmp_path / "data" / "cleaned")
+    for name in ALL_TEST_DATASETS:
+        shutil.copy(os.path.join(ROOT, "data", "cleaned", name + ".csv"), tmp_path / "data" / "cleaned")
+    shutil.copytree(os.path.join(ROOT, "data", "original"), tmp_path / "data" / "original")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,329 @@
+import hashlib
+import pandas as pd
+import numpy as np
+import os
+from vocabulary import Vocabulary, StringArray
+
+# Test datasets, each classified and scored on its own
+TEST_DATASETS = ["semeval2007", "semeval2013", "semeval2015", "senseval2", "senseval3"]
+
+# Union of the test datasets, with the name of the original dataset as prefix of the ids, e.g. senseval2.d000.s000.t000
+UNION_DATASET = "allTest"
+
+ALL_TEST_DATASETS = TEST_DATASETS + [UNION_DATASET]
+
+# Gold standard key file of each test dataset
+GOLD_KEY_FILES = {name: "data/original/" + name + "/" + name + ".gold.key.txt" for name in TEST_DATASETS}
+GOLD_KEY_FILES[UNION_DATASET] = "data/original/allTest/ALL.gold.key.txt"
+
+
+def hashPath(path):
+    """
+    Hash the content of a file, or of all files in a directory.
+
+    :param path: file path to a file or directory
+    :return: hexadecimal SHA-256 digest, or None if the path does not exist
+    """
+
+    if not os.path.exists(path):
+        return None
+
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        for directory, directories, files in sorted(os.walk(path)):
+            directories.sort()
+            for name in sorted(files):
+                filePath = os.path.join(directory, name)
+                digest.update(os.path.relpath(filePath, path).encode("utf-8") + b"\0" + hashPath(filePath).encode("ascii"))
+        return digest.hexdigest()
+
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Columns of the instances of a dataset stored with its sentences, where position is the position of the
+# target word in the cleaned sentence that is left out of the context, or -1 if the target word is not in the cleaned sentence
+INSTANCE_COLUMNS = ["id", "target_word", "pos", "sentence", "position"]
+
+
+class SentenceStore:
+    """
+    The cleaned sentences of datasets, each stored once as token ids. The instances of a sentence refer to it
+    by position, so the context of an instance is its sentence without the token at the target position.
+    """
+
+    def __init__(self, tokens, sentenceTokens, sentenceIndptr):
+        self.tokens = tokens                    # Vocabulary of the token strings
+        self.sentenceTokens = sentenceTokens    # Array with the token ids of all sentences, one sentence after the other
+        self.sentenceIndptr = sentenceIndptr    # Array with the start of each sentence in sentenceTokens and the end of the last one
+
+
+    def __len__(self):
+        return len(self.sentenceIndptr) - 1
+
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Load the sentences of a dataset written by preprocess.writeSentences.
+
+        :param directory: directory of the dataset
+        :return: SentenceStore
+        """
+
+        def load(name):
+            return np.load(os.path.join(directory, name + ".npy"))
+
+        return cls(Vocabulary.load(directory), load("sentenceTokens"), load("sentenceIndptr"))
+
+
+    @classmethod
+    def merge(cls, stores):
+        """
+        Merge the sentences of several datasets. Sentences with the same tokens, e.g. a sentence of a dataset and its copy in the union dataset, are stored once.
+
+        :param stores: list of SentenceStore
+        :return: tuple of the merged SentenceStore, and a list with the array of the merged sentence ids of each store
+        """
+
+        tokens = Vocabulary()
+        sentenceIds = {}
+        sentences = []
+        sentenceMaps = []
+        for store in stores:
+            tokenMap = tokens.encode(store.tokens, add = True)
+            sentenceMap = np.zeros(len(store), dtype = np.int64)
+            for index in range(len(store)):
+                sentence = tokenMap[store.sentenceTokens[store.sentenceIndptr[index]:store.sentenceIndptr[index + 1]]]
+                key = sentence.tobytes()
+                if key not in sentenceIds:
+                    sentenceIds[key] = len(sentences)
+                    sentences.append(sentence)
+                sentenceMap[index] = sentenceIds[key]
+            sentenceMaps.append(sentenceMap)
+
+        sentenceIndptr = np.zeros(len(sentences) + 1, dtype = np.int64)
+        sentenceIndptr[1:] = np.cumsum([len(sentence) for sentence in sentences])
+        sentenceTokens = np.concatenate(sentences).astype(np.int32) if sentences else np.zeros(0, dtype = np.int32)
+        return cls(tokens, sentenceTokens, sentenceIndptr), sentenceMaps
+
+
+    def contextLengths(self, sentenceIds, positions):
+        """
+        :param sentenceIds: array with the sentence of each instance
+        :param positions: array with the target position of each instance, or -1
+        :return: array with the number of tokens in the context of each instance
+        """
+
+        sentenceIds = np.asarray(sentenceIds, dtype = np.int64)
+        return self.sentenceIndptr[sentenceIds + 1] - self.sentenceIndptr[sentenceIds] - (np.asarray(positions) >= 0)
+
+
+    def instanceTokens(self, sentenceIds, positions):
+        """
+        Find the tokens in the contexts of several instances at once.
+
+        :param sentenceIds: array with the sentence of each instance
+        :param positions: array with the target position of each instance, or -1
+        :return: tuple of an array with the instance of each context token, and an array with its token id
+        """
+
+        sentenceIds = np.asarray(sentenceIds, dtype = np.int64)
+        starts = self.sentenceIndptr[sentenceIds]
+        lengths = self.sentenceIndptr[sentenceIds + 1] - starts
+        rows = np.repeat(np.arange(len(sentenceIds)), lengths)
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        keep = offsets != np.repeat(np.asarray(positions, dtype = np.int64), lengths)
+        return rows[keep], self.sentenceTokens[(np.repeat(starts, lengths) + offsets)[keep]]
+
+
+    def contextIds(self, sentence, position):
+        """
+        :param sentence: sentence of an instance
+        :param position: target position of the instance, or -1
+        :return: list of the token ids in the context of the instance
+        """
+
+        tokens = self.sentenceTokens[self.sentenceIndptr[sentence]:self.sentenceIndptr[sentence + 1]].tolist()
+        if position >= 0:
+            tokens.pop(position)
+        return tokens
+
+
+    def context(self, sentence, position):
+        """
+        :param sentence: sentence of an instance
+        :param position: target position of the instance, or -1
+        :return: list of the words in the context of the instance
+        """
+
+        return self.tokens.decode(self.contextIds(sentence, position))
+
+
+class SentenceReader:
+    """
+    Reads the sentences of a dataset written by preprocess.writeSentences from memory-mapped files, so instances can be
+    classified a chunk at a time with only the sentences of the chunk in memory.
+    """
+
+    def __init__(self, directory):
+        def load(name):
+            return np.load(os.path.join(directory, name + ".npy"), mmap_mode = "r")
+
+        self.tokens = StringArray(load("tokens"), load("tokenOffsets"))     # Token strings, indexed by token id
+        self.sentenceTokens = load("sentenceTokens")                        # Array with the token ids of all sentences, one sentence after the other
+        self.sentenceIndptr = load("sentenceIndptr")                        # Array with the start of each sentence in sentenceTokens and the end of the last one
+
+
+    def __len__(self):
+        return len(self.sentenceIndptr) - 1
+
+
+    def select(self, sentenceIds):
+        """
+        Load the sentences of a chunk of instances.
+
+        :param sentenceIds: array with the sentence of each instance
+        :return: tuple of a SentenceStore with the distinct sentences and their tokens, and an array with the sentence of each instance in it
+        """
+
+        distinct, sentences = np.unique(np.asarray(sentenceIds, dtype = np.int64), return_inverse = True)
+        starts = self.sentenceIndptr[distinct]
+        lengths = self.sentenceIndptr[distinct + 1] - starts
+        sentenceIndptr = np.zeros(len(distinct) + 1, dtype = np.int64)
+        sentenceIndptr[1:] = np.cumsum(lengths)
+        tokenIds = np.concatenate([self.sentenceTokens[start:start + length] for start, length in zip(starts, lengths)] + [np.zeros(0, dtype = np.int32)])
+
+        distinctTokens, sentenceTokens = np.unique(tokenIds, return_inverse = True)
+        tokens = Vocabulary(self.tokens[tokenId] for tokenId in distinctTokens.tolist())
+        return SentenceStore(tokens, sentenceTokens.astype(np.int32), sentenceIndptr), sentences
+
+
+def loadSentenceDataset(directory):
+    """
+    Load a dataset written by preprocess.writeSentences, and remove instances with NaN values or an empty context,
+    like the rows with NaN values of a CSV dataset.
+
+    :param directory: directory of the dataset
+    :return: tuple of a DataFrame with the columns <id, target_word, pos, sentence, position[, sense_class]>, and the SentenceStore
+    """
+
+    sentences = SentenceStore.load(directory)
+    data = pd.read_csv(os.path.join(directory, "instances.csv")).dropna()
+    data = data[sentences.contextLengths(data["sentence"], data["position"]) > 0]
+    return data.reset_index(drop = True), sentences
+
+
+def contextString(row, sentences):
+    """
+    Get the context of an instance as a string, for rows of a CSV dataset or of a dataset stored with its sentences.
+
+    :param row: contains <context_string> or <sentence, position>
+    :param sentences: SentenceStore of the sentences, if the row refers to a sentence
+    :return: the words in the context separated by spaces
+    """
+
+    if hasattr(row, "context_string"):
+        return row.context_string
+    return " ".join(sentences.context(row.sentence, row.position))
+
+
+def loadTestDatasets(grouped = None):
+    """
+    Load the test datasets, and remove rows with NaN values. Datasets stored with their sentences,
+    in a directory data/cleaned/<name>, share one SentenceStore, while datasets in data/cleaned/<name>.csv have a context string per row.
+
+    :param grouped: boolean value - load the datasets stored with their sentences instead of the CSV files?
+                    By default they are loaded if all the test datasets are stored with their sentences
+    :return: tuple of a dictionary with key: dataset name, value: DataFrame with the columns <id, target_word, context_string> or
+             <id, target_word, pos, sentence, position>, and the SentenceStore of the datasets or None for CSV datasets
+    """
+
+    if grouped is None:
+        grouped = all(os.path.isdir("data/cleaned/" + name) for name in ALL_TEST_DATASETS)
+
+    datasets = {}
+    stores = {}
+    for name in ALL_TEST_DATASETS:
+        if grouped:
+            datasets[name], stores[name] = loadSentenceDataset("data/cleaned/" + name)
+        else:
+            data = pd.read_csv("data/cleaned/" + name + ".csv")
+            datasets[name] = data.dropna().reset_index(drop = True)
+
+    if not grouped:
+        return datasets, None
+
+    # Refer to the sentences of all datasets in one store
+    sentences, sentenceMaps = SentenceStore.merge(list(stores.values()))
+    for name, sentenceMap in zip(stores, sentenceMaps):
+        datasets[name]["sentence"] = sentenceMap[datasets[name]["sentence"].to_numpy(dtype = np.int64)]
+    return datasets, sentences
+
+
+def targetWords(datasets):
+    """
+    :param datasets: iterable of DataFrames with a target_word column, or None for datasets that are not loaded
+    :return: set of the target words of the datasets
+    """
+
+    words = set()
+    for data in datasets:
+        if data is not None:
+            words.update(data["target_word"])
+    return words
+
+
+def sentenceDatasets(datasets):
+    """
+    Store the contexts of CSV datasets in one SentenceStore, each distinct context once as a sentence without a target position,
+    so the context strings are split into tokens once for all the classifiers.
+
+    :param datasets: dictionary with key: dataset name, value: DataFrame with the columns <id, target_word, context_string[, pos]>
+    :return: tuple of a dictionary with key: dataset name, value: DataFrame with the columns <id, target_word[, pos], sentence, position>,
+             and the SentenceStore of the datasets
+    """
+
+    tokens = Vocabulary()
+    sentenceIds = {}
+    sentences = []
+    converted = {}
+    for name, data in datasets.items():
+        rowSentences = np.zeros(len(data), dtype = np.int64)
+        for index, context in enumerate(data["context_string"]):
+            sentence = sentenceIds.get(context)
+            if sentence is None:
+                sentence = sentenceIds[context] = len(sentences)
+                sentences.append(tokens.encode(context.split(), add = True))
+            rowSentences[index] = sentence
+        converted[name] = data.drop(columns = ["context_string"]).assign(sentence = rowSentences, position = -1)
+
+    sentenceIndptr = np.zeros(len(sentences) + 1, dtype = np.int64)
+    sentenceIndptr[1:] = np.cumsum([len(sentence) for sentence in sentences])
+    sentenceTokens = np.concatenate(sentences).astype(np.int32) if sentences else np.zeros(0, dtype = np.int32)
+    return converted, SentenceStore(tokens, sentenceTokens, sentenceIndptr)
+
+
+def uniqueInstances(datasets):
+    """
+    Find the distinct instances of several datasets. The classifiers only use the columns other than the id,
+    so instances with the same target word, context and part of speech, such as an instance and its copy in the union dataset, get the same prediction.
+
+    :param datasets: dictionary with key: dataset name, value: DataFrame with the columns <id, target_word, context_string[, pos]>
+    :return: tuple of a DataFrame with the distinct instances without ids,
+             and a dictionary with key: dataset name, value: array with the position of each row in the distinct instances
+    """
+
+    columns = [column for column in next(iter(datasets.values())).columns if column != "id" and all(column in data for data in datasets.values())]
+    instances = pd.concat([data[columns] for data in datasets.values()], ignore_index = True)
+    codes = instances.groupby(columns, sort = False).ngroup().to_numpy()
+    unique = instances.drop_duplicates().reset_index(drop = True)
+
+    positions = {}
+    start = 0
+    for name, data in datasets.items():
+        positions[name] = codes[start:start + len(data)]
+        start += len(data)
+    return unique, positions
@@ -1,77 +1,75 @@
-from preprocess import preprocess
-from SimplifiedLesk import SimplifiedLesk
-from NaiveBayesWSD import NaiveBayesWSD
-from MostFrequentSense import MostFrequentSense
+import os
+import metrics
+from preprocess import preprocessParallel
+from classifiers import ALGORITHMS, runAlgorithms
 
 DATA = [
             {   
                 "name": "semcor",
-                "goldKeyFp": "data\original\semcor\semcor.gold.key.clean.txt",
-                "xmlFp": "data\original\semcor\semcor.data.xml",
+                "goldKeyFp": "data/original/semcor/semcor.gold.key.clean.txt",
+                "xmlFp": "data/original/semcor/semcor.data.xml",
                 "isTrainingSet": True
             },
             {
-                "name": "all",
+                "name": "allTest",
                 "goldKeyFp": "data/original/allTest/ALL.gold.key.txt",
                 "xmlFp": "data/original/allTest/ALL.data.xml",
                 "isTrainingSet": False
             },
             {
                 "name": "semeval2007",
-                "goldKeyFp": "data\original\semeval2007\semeval2007.gold.key.txt",
-                "xmlFp": "data\original\semeval2007\semeval2007.data.xml",
+                "goldKeyFp": "data/original/semeval2007/semeval2007.gold.key.txt",
+                "xmlFp": "data/original/semeval2007/semeval2007.data.xml",
                 "isTrainingSet": False
             },
             {
                 "name": "semeval2013",
-                "goldKeyFp": "data\original\semeval2013\semeval2013.gold.key.txt",
-                "xmlFp": "data\original\semeval2013\semeval2013.data.xml",
+                "goldKeyFp": "data/original/semeval2013/semeval2013.gold.key.txt",
+                "xmlFp": "data/original/semeval2013/semeval2013.data.xml",
                 "isTrainingSet": False
             },
             {
                 "name": "semeval2015",
-                "goldKeyFp": "data\original\semeval2015\semeval2015.gold.key.txt",
-                "xmlFp": "data\original\semeval2015\semeval2015.data.xml",
+                "goldKeyFp": "data/original/semeval2015/semeval2015.gold.key.txt",
+                "xmlFp": "data/original/semeval2015/semeval2015.data.xml",
                 "isTrainingSet": False
             }, {
                 "name": "senseval2",
-                "goldKeyFp": "data\original\senseval2\senseval2.gold.key.txt",
-                "xmlFp": "data\original\senseval2\senseval2.data.xml",
+                "goldKeyFp": "data/original/senseval2/senseval2.gold.key.txt",
+                "xmlFp": "data/original/senseval2/senseval2.data.xml",
                 "isTrainingSet": False
             },
             {
                 "name": "senseval3",
-                "goldKeyFp": "data\original\senseval3\senseval3.gold.key.txt",
-                "xmlFp": "data\original\senseval3\senseval3.data.xml",
+                "goldKeyFp": "data/original/senseval3/senseval3.gold.key.txt",
+                "xmlFp": "data/original/senseval3/senseval3.data.xml",
                 "isTrainingSet": False
             }
         ]
 
-def main():
-
-
-    # 1 - Preprocess the datasets
-    for dataset in DATA:
-        preprocess(dataset["name"], dataset["goldKeyFp"], dataset["xmlFp"], dataset["isTrainingSet"])
-
-    # 2 - Perform word sense disambiguation using the simplified Lesk algorithm
-    simplifiedLesk = SimplifiedLesk() 
-    simplifiedLesk.loadData()
-    simplifiedLesk.runClassification()
+# Number of worker processes and rows sent to a worker at a time when classifying
+WORKERS = os.cpu_count()
+CHUNK_SIZE = 1000
 
+def main():
 
-    # 3 - Perform word sense disambiguation using the Naive Bayes classifier
-    naiveBayes = NaiveBayesWSD() 
-    naiveBayes.loadData()
-    naiveBayes.trainModel()
-    naiveBayes.runClassification()
+    # Stages are profiled when WSD_PROFILE is set to cprofile or sampling, and metrics are collected when WSD_METRICS=1.
+    # The metrics of the worker processes are sent back and merged, but the profiles only cover this process,
+    # so use WORKERS = 1 to profile classification
 
-    # 4 - Perform word sense disambiguation using the most frequent sense
-    mostFrequentSense = MostFrequentSense()
-    mostFrequentSense.loadData()
-    mostFrequentSense.runClassification()
+    # 1 - Preprocess the datasets in parallel
+    with metrics.profile("preprocess"):
+        preprocessParallel(DATA)
 
+    # 2 - Perform word sense disambiguation with the simplified Lesk algorithm, the Naive Bayes classifier and the most frequent sense
+    # in one pass: the test datasets are loaded once and shared, and each chunk of instances is classified by every algorithm.
+    # The Lesk signature index, the Naive Bayes model and the most frequent sense table are built and saved first if they do not exist.
+    # The Naive Bayes model is trained from the training dataset streamed in chunks, so later runs only have to load it.
+    # New annotations can be added to the saved model with loadModel, trainFromFile and saveModel
+    with metrics.profile("classify"):
+        runAlgorithms(list(ALGORITHMS), WORKERS, CHUNK_SIZE)
 
+    metrics.write()
 
 
 if __name__ == '__main__':
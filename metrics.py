@@ -0,0 +1,318 @@
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+# Metrics are only collected when enabled, by setting WSD_METRICS=1 or calling enable()
+ENABLED = os.environ.get("WSD_METRICS", "") == "1"
+
+# Profiler used by profile(): "cprofile", "sampling", or empty for no profiling. Set with WSD_PROFILE or setProfiler()
+PROFILER = os.environ.get("WSD_PROFILE", "")
+
+PROFILE_DIRECTORY = "results/profiles"
+METRICS_PATH = "results/metrics.json"
+
+counters = defaultdict(int)     # Dictionary with key: metric name, value: count
+timers = defaultdict(float)     # Dictionary with key: metric name, value: total seconds
+
+
+def enable(enabled = True):
+    """
+    Turn collection of metrics on or off.
+
+    :param enabled: boolean value - collect metrics?
+    """
+
+    global ENABLED
+    ENABLED = enabled
+
+
+def setProfiler(profiler):
+    """
+    Choose the profiler used by profile().
+
+    :param profiler: "cprofile", "sampling", or None for no profiling
+    """
+
+    global PROFILER
+    PROFILER = profiler or ""
+
+
+def increment(name, amount = 1):
+    """
+    Add to a counter.
+
+    :param name: name of the counter
+    :param amount: amount to add
+    """
+
+    if ENABLED:
+        counters[name] += amount
+
+
+def timed(name):
+    """
+    Decorator that counts the calls of a function and the time spent in it.
+
+    :param name: name of the metric
+    :return: decorator
+    """
+
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                timers[name] += time.perf_counter() - start
+                counters[name + ".calls"] += 1
+        return wrapper
+    return decorator
+
+
+def timedCall(name, function, *args, **kwargs):
+    """
+    Call a function, counting the call and the time spent in it.
+
+    :param name: name of the metric
+    :param function: function to call
+    :return: result of the function
+    """
+
+    if not ENABLED:
+        return function(*args, **kwargs)
+    start = time.perf_counter()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        timers[name] += time.perf_counter() - start
+        counters[name + ".calls"] += 1
+
+
+def timedIterator(name, iterator):
+    """
+    Count the items of an iterator and the time spent producing them.
+
+    :param name: name of the metric
+    :param iterator: iterator to measure
+    :return: the iterator itself when metrics are disabled, otherwise a measured iterator
+    """
+
+    if not ENABLED:
+        return iterator
+
+    def measured():
+        items = iter(iterator)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            finally:
+                timers[name] += time.perf_counter() - start
+            counters[name + ".items"] += 1
+            yield item
+    return measured()
+
+
+def report():
+    """
+    Get the collected metrics.
+
+    :return: dictionary with the counters and the timers in seconds
+    """
+
+    return {"counters": dict(counters), "timers": dict(timers)}
+
+
+def reset():
+    """
+    Remove all collected metrics.
+    """
+
+    counters.clear()
+    timers.clear()
+
+
+def collect():
+    """
+    Get the metrics collected since the last call and remove them, e.g. to send the metrics of a worker process to the parent process.
+
+    :return: dictionary with the counters and the timers in seconds, see report, or None if metrics are disabled
+    """
+
+    if not ENABLED:
+        return None
+    collected = report()
+    reset()
+    return collected
+
+
+def merge(collected):
+    """
+    Add metrics collected in another process.
+
+    :param collected: dictionary returned by collect, or None
+    """
+
+    if collected is None:
+        return
+    for name, count in collected["counters"].items():
+        counters[name] += count
+    for name, seconds in collected["timers"].items():
+        timers[name] += seconds
+
+
+def initializeWorker(enabled):
+    """
+    Prepare the metrics of a worker process: use the same setting as the parent process,
+    and remove the metrics copied from the parent process when the worker was forked.
+
+    :param enabled: boolean value - does the parent process collect metrics?
+    """
+
+    enable(enabled)
+    reset()
+
+
+def collectCall(function, *args, **kwargs):
+    """
+    Call a function in a worker process, and collect the metrics of the call to send them back with the result.
+
+    :param function: function to call
+    :return: tuple of the result of the function and the collected metrics, see collect
+    """
+
+    result = function(*args, **kwargs)
+    return result, collect()
+
+
+def mergeResult(result):
+    """
+    Merge the metrics sent back by collectCall from a worker process.
+
+    :param result: tuple returned by collectCall
+    :return: result of the function
+    """
+
+    value, collected = result
+    merge(collected)
+    return value
+
+
+def write(path = METRICS_PATH):
+    """
+    Write the collected metrics to a JSON file, if metrics are enabled.
+
+    :param path: file path to the JSON file
+    """
+
+    if not ENABLED:
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok = True)
+    with open(path, "w") as file:
+        json.dump(report(), file, indent = 2, sort_keys = True)
+
+
+class SamplingProfiler:
+    """
+    Profiler that records the stack of a thread at a fixed interval, written as collapsed stacks for flame graphs.
+    """
+
+    def __init__(self, interval = 0.005):
+        self.interval = interval                # Seconds between samples
+        self.samples = defaultdict(int)         # Dictionary with key: collapsed stack, value: number of samples
+        self.threadId = None                    # Id of the profiled thread
+        self.stopped = threading.Event()
+        self.thread = None
+
+
+    def start(self):
+        """
+        Start sampling the current thread.
+        """
+
+        self.threadId = threading.get_ident()
+        self.stopped.clear()
+        self.thread = threading.Thread(target = self.run, daemon = True)
+        self.thread.start()
+
+
+    def run(self):
+        """
+        Record the stack of the profiled thread until stopped.
+        """
+
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.threadId)
+            stack = []
+            while frame is not None:
+                stack.append("%s (%s:%d)" % (frame.f_code.co_name, os.path.basename(frame.f_code.co_filename), frame.f_code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+
+    def stop(self):
+        """
+        Stop sampling.
+        """
+
+        self.stopped.set()
+        self.thread.join()
+
+
+    def write(self, path):
+        """
+        Write the samples as collapsed stacks, one "stack count" line per distinct stack.
+
+        :param path: file path to write to
+        """
+
+        with open(path, "w") as file:
+            for stack, count in sorted(self.samples.items()):
+                file.write(stack + " " + str(count) + "\n")
+
+
+@contextmanager
+def profile(stage, directory = PROFILE_DIRECTORY):
+    """
+    Profile a stage with the chosen profiler, and write the profile to <directory>/<stage>.prof for cProfile
+    or <directory>/<stage>.folded for the sampling profiler. Does nothing when no profiler is chosen.
+
+    :param stage: name of the stage
+    :param directory: directory to write the profile to
+    """
+
+    if not PROFILER:
+        yield
+        return
+
+    os.makedirs(directory, exist_ok = True)
+    if PROFILER == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(directory, stage + ".prof"))
+    elif PROFILER == "sampling":
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            profiler.write(os.path.join(directory, stage + ".folded"))
+    else:
+        raise ValueError("Unknown profiler: " + PROFILER)
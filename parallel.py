@@ -0,0 +1,125 @@
+import os
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from datasets import uniqueInstances
+import metrics
+
+# Classifier used by the tasks of a worker process, created once per worker
+workerClassifier = None
+
+
+def initializeWorker(factory, sentences = None, metricsEnabled = False):
+    """
+    Create the classifier of a worker process.
+
+    :param factory: function without arguments that returns a classifier ready to classify
+    :param sentences: SentenceStore of the datasets stored with their sentences, or None
+    :param metricsEnabled: boolean value - collect metrics, which are sent back with the result of each chunk?
+    """
+
+    global workerClassifier
+    metrics.initializeWorker(metricsEnabled)
+    workerClassifier = factory()
+    workerClassifier.sentences = sentences
+
+
+def classifyChunk(chunk, sentences = None):
+    """
+    Classify a chunk of a dataset with the classifier of the worker process.
+
+    :param chunk: DataFrame with the columns <id, target_word, context_string> or <id, target_word, pos, sentence, position>
+    :param sentences: SentenceStore the chunk refers to, if it is not the one the worker was initialized with
+    :return: tuple of the list of predicted sense classes in the order of the chunk, and the metrics collected in the worker,
+             see metrics.mergeResult
+    """
+
+    if sentences is not None:
+        workerClassifier.sentences = sentences
+    return list(workerClassifier.classifyBatch(chunk)), metrics.collect()
+
+
+def classifyParallel(classifier, data, executor = None, chunkSize = 1000):
+    """
+    Classify a dataset, split into chunks that are classified in a process pool.
+
+    :param classifier: classifier used when there is no process pool
+    :param data: DataFrame with the columns <id, target_word, context_string> or <id, target_word, pos, sentence, position>
+    :param executor: process pool whose workers were initialized with initializeWorker, or None to classify in this process
+    :param chunkSize: number of rows in a chunk
+    :return: Series with the predicted sense classes, aligned with the index of data
+    """
+
+    if executor is None or len(data) <= chunkSize:
+        return pd.Series(list(classifier.classifyBatch(data)), index = data.index, dtype = object)
+
+    chunks = [data.iloc[start:start + chunkSize] for start in range(0, len(data), chunkSize)]
+    predicted = [sense for chunkResult in executor.map(classifyChunk, chunks) for sense in metrics.mergeResult(chunkResult)]
+    return pd.Series(predicted, index = data.index, dtype = object)
+
+
+def classifyInstances(classifier, factory, datasets, workers = 1, chunkSize = 1000, sentences = None):
+    """
+    Classify each distinct instance of the test datasets once.
+
+    :param classifier: classifier used when there is only one worker
+    :param factory: function without arguments that returns a classifier ready to classify, called once in each worker
+    :param datasets: dictionary with key: dataset name, value: DataFrame with the columns <id, target_word, context_string> or <id, target_word, pos, sentence, position>
+    :param workers: number of worker processes
+    :param chunkSize: number of rows sent to a worker at a time
+    :param sentences: SentenceStore the datasets refer to, if they are stored with their sentences
+    :return: tuple of the array with the prediction of each distinct instance, and a dictionary with key: dataset name,
+             value: array with the distinct instance of each row, see datasets.uniqueInstances
+    """
+
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(workers, initializer = initializeWorker, initargs = (factory, sentences, metrics.ENABLED))
+
+    try:
+        instances, positions = uniqueInstances(datasets)
+        predicted = classifyParallel(classifier, instances, executor, chunkSize).to_numpy()
+        metrics.increment("classification.instanceCache.miss", len(instances))
+        metrics.increment("classification.instanceCache.hit", sum(len(data) for data in datasets.values()) - len(instances))
+        return predicted, positions
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def writeResults(datasets, predicted, positions, outputFilePath):
+    """
+    Write the prediction of every row of the test datasets to the results files.
+
+    :param datasets: dictionary with key: dataset name, value: DataFrame with an id column
+    :param predicted: array with the prediction of each distinct instance
+    :param positions: dictionary with key: dataset name, value: array with the distinct instance of each row
+    :param outputFilePath: file path of the results, with {} in place of the dataset name
+    :return: dictionary with key: dataset name, value: DataFrame with the columns <id, predicted>
+    """
+
+    results = {}
+    for name, data in datasets.items():
+        data = pd.DataFrame({"id": data["id"].to_numpy(), "predicted": predicted[positions[name]]}, index = data.index)
+        os.makedirs(os.path.dirname(outputFilePath.format(name)) or ".", exist_ok = True)
+        data.to_csv(outputFilePath.format(name), sep = ' ', header = False, index = False)
+        results[name] = data
+    return results
+
+
+def runClassification(classifier, factory, datasets, outputFilePath, workers = 1, chunkSize = 1000, sentences = None):
+    """
+    Classify all the words in the test datasets and save results to file.
+    Each distinct instance is classified once, and its prediction is written for every dataset that contains it.
+
+    :param classifier: classifier used when there is only one worker
+    :param factory: function without arguments that returns a classifier ready to classify, called once in each worker
+    :param datasets: dictionary with key: dataset name, value: DataFrame with the columns <id, target_word, context_string> or <id, target_word, pos, sentence, position>
+    :param outputFilePath: file path of the results, with {} in place of the dataset name
+    :param workers: number of worker processes
+    :param chunkSize: number of rows sent to a worker at a time
+    :param sentences: SentenceStore the datasets refer to, if they are stored with their sentences
+    :return: dictionary with key: dataset name, value: DataFrame with the columns <id, predicted>
+    """
+
+    predicted, positions = classifyInstances(classifier, factory, datasets, workers, chunkSize, sentences)
+    return writeResults(datasets, predicted, positions, outputFilePath)
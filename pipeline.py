@@ -0,0 +1,246 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from preprocess import preprocessParallel, outputPath, englishStopwords, FORBIDDEN_WORDS
+from NaiveBayesWSD import NaiveBayesWSD, MODEL_DIRECTORY
+from SimplifiedLesk import INDEX_PATH
+from MostFrequentSense import TABLE_PATH
+from wordnetSnapshot import buildSnapshot, wordnetVersion, SNAPSHOT_DIRECTORY
+from datasets import loadTestDatasets, hashPath, ALL_TEST_DATASETS, GOLD_KEY_FILES
+from classifiers import ALGORITHMS, createClassifier, runAlgorithms
+import scorer
+from main import DATA, WORKERS, CHUNK_SIZE
+
+MANIFEST_PATH = ".pipeline/manifest.json"
+SCORES_PATH = "results/scores.md"
+
+
+class Stage:
+    """
+    A step of the pipeline, identified by a hash of its input files, source files and parameters.
+    """
+
+    def __init__(self, name, inputs, outputs, parameters = None, sources = ()):
+        self.name = name                    # Unique name of the stage
+        self.inputs = list(inputs)          # File paths read by the stage
+        self.outputs = list(outputs)        # File paths written by the stage
+        self.parameters = parameters or {}  # Dictionary with the parameters that change the outputs, must be JSON serializable
+        self.sources = list(sources)        # File paths to the code of the stage
+
+
+    def key(self):
+        """
+        Hash the inputs, parameters and code of the stage. Inputs written by earlier stages are hashed as they are now.
+
+        :return: hexadecimal SHA-256 digest
+        """
+
+        content = {
+            "inputs": {path: hashPath(path) for path in self.inputs},
+            "sources": {path: hashPath(path) for path in self.sources},
+            "parameters": self.parameters,
+        }
+        return hashlib.sha256(json.dumps(content, sort_keys = True).encode("utf-8")).hexdigest()
+
+
+class Manifest:
+    """
+    The key of each stage at the time its outputs were written.
+    """
+
+    def __init__(self, path = MANIFEST_PATH):
+        self.path = path
+        self.keys = {}
+        if os.path.exists(path):
+            with open(path) as file:
+                self.keys = json.load(file)
+
+
+    def isFresh(self, stage, key):
+        """
+        Check if the outputs of a stage were written for the same key and still exist.
+
+        :param stage: the stage
+        :param key: the current key of the stage
+        :return: boolean value - can the stage be skipped?
+        """
+
+        return self.keys.get(stage.name) == key and all(os.path.exists(path) for path in stage.outputs)
+
+
+    def record(self, stage, key):
+        """
+        Store the key of a stage whose outputs were written, and save the manifest.
+
+        :param stage: the stage
+        :param key: the key of the stage when it was run
+        """
+
+        self.keys[stage.name] = key
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok = True)
+        with open(self.path, "w") as file:
+            json.dump(self.keys, file, indent = 2, sort_keys = True)
+
+
+def runStage(manifest, stage, run, force = False):
+    """
+    Run a stage, unless its outputs are up to date.
+
+    :param manifest: the manifest
+    :param stage: the stage
+    :param run: function without arguments that writes the outputs of the stage
+    :param force: boolean value - run the stage even if it is up to date?
+    :return: boolean value - was the stage run?
+    """
+
+    key = stage.key()
+    if not force and manifest.isFresh(stage, key):
+        print("Skipping ", stage.name, ": up to date")
+        return False
+
+    print("Running ", stage.name)
+    run()
+    manifest.record(stage, key)
+    return True
+
+
+def preprocessStage(dataset):
+    """
+    :param dataset: dictionary with the keys <name, goldKeyFp, xmlFp, isTrainingSet>
+    :return: the stage that preprocesses the dataset
+    """
+
+    grouped = dataset.get("grouped", not dataset["isTrainingSet"])
+    inputs = [dataset["xmlFp"]] + ([dataset["goldKeyFp"]] if dataset["isTrainingSet"] else [])
+    parameters = {"isTrainingSet": dataset["isTrainingSet"], "grouped": grouped, "stopwords": sorted(englishStopwords()), "forbiddenWords": FORBIDDEN_WORDS}
+    return Stage("preprocess/" + dataset["name"], inputs, [outputPath(dataset["name"], grouped)], parameters, ["preprocess.py", "datasets.py", "vocabulary.py"])
+
+
+def testDatasetFiles():
+    """
+    :return: list of paths to the cleaned test datasets, in both formats because datasets.loadTestDatasets chooses which one to load
+    """
+
+    return [outputPath(name, grouped) for name in ALL_TEST_DATASETS for grouped in (True, False)]
+
+
+def resultFiles(algorithm):
+    """
+    :param algorithm: algorithm name, a key of ALGORITHMS
+    :return: list of file paths to the results of the algorithm
+    """
+
+    return [ALGORITHMS[algorithm][1].format(name) for name in ALL_TEST_DATASETS]
+
+
+def trainNaiveBayes(alpha):
+    naiveBayes = NaiveBayesWSD()
+    naiveBayes.alpha = alpha
+    naiveBayes.trainFromFile()
+    naiveBayes.saveModel()
+
+
+def buildWordNetSnapshot():
+    datasets, _ = loadTestDatasets()
+    buildSnapshot(SNAPSHOT_DIRECTORY, {word for data in datasets.values() for word in data["target_word"]})
+
+
+def rebuildCache(algorithm, path):
+    """
+    Remove the cached model of a classifier and build it again for the loaded test datasets.
+
+    :param algorithm: algorithm name, a key of ALGORITHMS
+    :param path: file path to, or directory of, the cached model, which the classifier builds and saves when it does not exist
+    """
+
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+    createClassifier(algorithm, *loadTestDatasets())
+
+
+def score():
+    scores = scorer.score(scorer.findResults())
+    os.makedirs(os.path.dirname(SCORES_PATH), exist_ok = True)
+    with open(SCORES_PATH, "w") as file:
+        for measure, title in [("precision", "P"), ("recall", "R"), ("f1", "F1")]:
+            file.write(title + "\n\n" + scorer.formatTable(scores, measure) + "\n\n")
+
+
+def runPipeline(alpha = 1, force = False, manifestPath = MANIFEST_PATH):
+    """
+    Run the stages preprocess -> train -> build the WordNet caches -> classify -> score, skipping the stages whose inputs, parameters and code did not change.
+
+    :param alpha: smoothing parameter of the Naive Bayes classifier
+    :param force: boolean value - run all stages?
+    :param manifestPath: file path to the manifest with the keys of the stages
+    """
+
+    manifest = Manifest(manifestPath)
+
+    # 1 - Preprocess the changed datasets in parallel
+    stages = [(dataset, preprocessStage(dataset)) for dataset in DATA]
+    stages = [(dataset, stage, stage.key()) for dataset, stage in stages]
+    stale = [(dataset, stage, key) for dataset, stage, key in stages if force or not manifest.isFresh(stage, key)]
+    for _, stage, _ in stages:
+        if all(stage is not staleStage for _, staleStage, _ in stale):
+            print("Skipping ", stage.name, ": up to date")
+    if stale:
+        preprocessParallel([dataset for dataset, _, _ in stale])
+        for _, stage, key in stale:
+            manifest.record(stage, key)
+
+    # 2 - Train the Naive Bayes classifier
+    trainingFiles = [outputPath(dataset["name"], False) for dataset in DATA if dataset["isTrainingSet"]]
+    runStage(manifest, Stage("train/naiveBayes", trainingFiles, [os.path.join(MODEL_DIRECTORY, "model.json")], {"alpha": alpha}, ["NaiveBayesWSD.py", "vocabulary.py"]),
+             lambda: trainNaiveBayes(alpha), force)
+
+    # 3 - Build the WordNet snapshot with the target words of the test datasets, then the Lesk signature index
+    # and the most frequent sense table from it
+    version = wordnetVersion()
+    cleaning = {"stopwords": sorted(englishStopwords()), "forbiddenWords": FORBIDDEN_WORDS}
+    runStage(manifest, Stage("build/wordnetSnapshot", testDatasetFiles(), [SNAPSHOT_DIRECTORY], {"wordnet": version}, ["wordnetSnapshot.py", "vocabulary.py"]),
+             buildWordNetSnapshot, force)
+    runStage(manifest, Stage("build/leskIndex", [SNAPSHOT_DIRECTORY], [INDEX_PATH], cleaning, ["SimplifiedLesk.py", "preprocess.py", "vocabulary.py"]),
+             lambda: rebuildCache("lesk", INDEX_PATH), force)
+    runStage(manifest, Stage("build/mostFreqTable", testDatasetFiles() + [SNAPSHOT_DIRECTORY], [TABLE_PATH], {}, ["MostFrequentSense.py", "datasets.py"]),
+             lambda: rebuildCache("mostFreq", TABLE_PATH), force)
+
+    # 4 - Classify the test datasets with the algorithms whose stage is not up to date, in one pass over the datasets
+    sources = ["parallel.py", "datasets.py", "vocabulary.py", "classifiers.py", "baseClassifier.py", "preprocess.py", "metrics.py"]
+    stages = {
+        "lesk": Stage("classify/lesk", testDatasetFiles() + [SNAPSHOT_DIRECTORY, INDEX_PATH], resultFiles("lesk"), {},
+                      sources + ["SimplifiedLesk.py", "wordnetSnapshot.py"]),
+        "naiveBayes": Stage("classify/naiveBayes", testDatasetFiles() + [MODEL_DIRECTORY], resultFiles("naiveBayes"), {}, sources + ["NaiveBayesWSD.py"]),
+        "mostFreq": Stage("classify/mostFreq", testDatasetFiles() + [SNAPSHOT_DIRECTORY, TABLE_PATH], resultFiles("mostFreq"), {},
+                          sources + ["MostFrequentSense.py", "wordnetSnapshot.py"]),
+    }
+    keys = {algorithm: stage.key() for algorithm, stage in stages.items()}
+    stale = [algorithm for algorithm, stage in stages.items() if force or not manifest.isFresh(stage, keys[algorithm])]
+    for algorithm, stage in stages.items():
+        if algorithm not in stale:
+            print("Skipping ", stage.name, ": up to date")
+    if stale:
+        print("Running ", ", ".join(stages[algorithm].name for algorithm in stale))
+        runAlgorithms(stale, WORKERS, CHUNK_SIZE)
+        for algorithm in stale:
+            manifest.record(stages[algorithm], keys[algorithm])
+
+    # 5 - Score the results
+    results = [path for algorithm in stages for path in resultFiles(algorithm)]
+    runStage(manifest, Stage("score", results + list(GOLD_KEY_FILES.values()), [SCORES_PATH], {}, ["scorer.py"]), score, force)
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Run the pipeline, skipping stages whose inputs did not change.")
+    parser.add_argument("--alpha", type = float, default = 1, help = "smoothing parameter of the Naive Bayes classifier")
+    parser.add_argument("--force", action = "store_true", help = "run all stages")
+    arguments = parser.parse_args()
+    runPipeline(arguments.alpha, arguments.force)
+
+
+if __name__ == '__main__':
+    main()
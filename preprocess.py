@@ -1,11 +1,281 @@
 import pandas as pd
+import numpy as np
 import xml.etree.ElementTree as ET
+import io
+import mmap
+import os
+import re
+import shutil
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 from nltk.corpus import stopwords
 from string import punctuation
-import copy
+from functools import lru_cache
+import metrics
+from datasets import INSTANCE_COLUMNS, SentenceStore
+from vocabulary import Vocabulary
 
+# Columns of the rows of a dataset with a context string per row
+ROW_COLUMNS = ["id", "target_word", "context_string", "pos"]
 
-def preprocess(name, goldKeyFilePath, xmlFilePath, isTrainingSet):
+# Want to clean data: remove stopwords and other non-words
+FORBIDDEN_WORDS = ["&apos;", "``", "''", "'", "`", "'s"]
+
+
+@lru_cache(maxsize = None)
+def englishStopwords():
+    """
+    Read the English stopwords once.
+
+    :return: set of English stopwords
+    """
+
+    return frozenset(stopwords.words('english'))
+
+
+def cleanContext(context):
+    """
+    Ensure lower-case an remove punctuation, numbers, non-words and stopwords
+
+    :param context: list of lemmas in a sentence
+    :return: cleaned list of words
+    """
+
+    stopwordSet = englishStopwords()
+    return [word.lower() for word in context if not word in punctuation and not word.isnumeric() and word not in FORBIDDEN_WORDS and word not in stopwordSet]
+
+
+def targetPositions(context, instances):
+    """
+    Find the position of the target word of each instance in the cleaned sentence, which is left out of its context.
+
+    :param context: cleaned list of words in the sentence
+    :param instances: list of (id, lemma, pos) tuples of the words to disambiguate
+    :return: list with the position of the first occurrence of each target word, or -1 if it does not occur
+    """
+
+    return [context.index(instance[1]) if instance[1] in context else -1 for instance in instances]
+
+
+def instanceRows(context, instances):
+    """
+    Create a row for each instance in a sentence, with the cleaned sentence as context.
+
+    :param context: list of lemmas in the sentence
+    :param instances: list of (id, lemma, pos) tuples of the words to disambiguate
+    :return: generator of dictionaries with the keys <id, target_word, context_string, pos>
+    """
+
+    context = cleanContext(context)
+    for instance, position in zip(instances, targetPositions(context, instances)):
+
+        # Remove target_word from context if it exists
+        contextCopy = context[:position] + context[position + 1:] if position >= 0 else context
+        contextCopy = " ".join(contextCopy)
+
+        yield {"id": instance[0], "target_word": instance[1], "context_string": contextCopy, "pos": instance[2]}
+
+
+def readSentence(sentence):
+    """
+    Read the lemmas and the instances of a sentence.
+
+    :param sentence: XML element of the sentence
+    :return: tuple of the list of lemmas in the sentence, and the list of (id, lemma, pos) tuples of the words to disambiguate
+    """
+
+    context = []
+    instances = []
+    for word in sentence:
+        context.append(word.attrib["lemma"])
+        if word.tag == "instance":
+            instances.append((word.attrib["id"], word.attrib["lemma"], word.attrib["pos"]))
+    return context, instances
+
+
+@metrics.timed("preprocess.sentenceRows")
+def sentenceRows(sentence):
+    """
+    Create a row for each instance in a sentence, with the cleaned sentence as context.
+
+    :param sentence: XML element of the sentence
+    :return: list of dictionaries with the keys <id, target_word, context_string, pos>
+    """
+
+    # The rows are created here rather than returned as a generator, so the timer covers creating them
+    return list(instanceRows(*readSentence(sentence)))
+
+
+def iterateSentenceElements(xmlFile):
+    """
+    Parse an XML file incrementally. Processed sentences and texts are cleared, so memory use does not grow with the size of the file.
+
+    :param xmlFile: file path to, or file object of, the XML file
+    :return: generator of the XML elements of the sentences
+    """
+
+    corpus = None
+    for event, element in metrics.timedIterator("preprocess.xmlParse", ET.iterparse(xmlFile, events = ("start", "end"))):
+        if event == "start":
+            if corpus is None:
+                corpus = element
+        elif element.tag == "sentence":
+            yield element
+            element.clear()
+        elif element.tag == "text":
+            corpus.clear()
+
+
+def iterateRows(xmlFile):
+    """
+    Parse an XML file incrementally and create the rows of each sentence.
+
+    :param xmlFile: file path to, or file object of, the XML file
+    :return: generator of dictionaries with the keys <id, target_word, context_string, pos>
+    """
+
+    for sentence in iterateSentenceElements(xmlFile):
+        yield from sentenceRows(sentence)
+
+
+def iterateSentences(xmlFile):
+    """
+    Parse an XML file incrementally and read each sentence.
+
+    :param xmlFile: file path to, or file object of, the XML file
+    :return: generator of tuples of the lemmas and the instances of each sentence, as returned by readSentence
+    """
+
+    for sentence in iterateSentenceElements(xmlFile):
+        yield readSentence(sentence)
+
+
+def iterateChunks(rows, chunkSize):
+    """
+    Group rows into lists of at most chunkSize rows.
+
+    :param rows: iterable of rows
+    :param chunkSize: maximum number of rows in a chunk, or None for a single chunk
+    :return: generator of lists of rows
+    """
+
+    if chunkSize is None:
+        yield list(rows)
+        return
+
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunkSize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def writeRows(rows, outputFilePath, senses = None, chunkSize = None, columns = ROW_COLUMNS):
+    """
+    Write rows to a CSV file, one chunk at a time.
+
+    :param rows: iterable of dictionaries with the keys in columns
+    :param outputFilePath: file path to the CSV file
+    :param senses: DataFrame with the columns <id, sense_class> to join with, if the dataset is the training set
+    :param chunkSize: number of rows to write at a time, or None to write all rows at once
+    :param columns: list of the columns of the rows
+    """
+
+    def writeChunk(chunk, isFirstChunk):
+        cleaned_data = pd.DataFrame(chunk, columns = columns)
+
+        # Join with the gold key file if the dataset is the training set
+        if senses is not None:
+            cleaned_data = cleaned_data.set_index('id').join(senses.set_index('id'))
+
+        cleaned_data.to_csv(outputFilePath, index = False, mode = "w" if isFirstChunk else "a", header = isFirstChunk)
+
+    isFirstChunk = True
+    for chunk in iterateChunks(rows, chunkSize):
+        writeChunk(chunk, isFirstChunk)
+        isFirstChunk = False
+
+    # A dataset without rows is still written, as a CSV file with only the header
+    if isFirstChunk:
+        writeChunk([], True)
+
+
+def saveSentences(directory, tokens, sentenceTokens, sentenceIndptr):
+    """
+    Save the token strings and the sentences of a dataset as .npy arrays.
+
+    :param directory: directory of the dataset
+    :param tokens: Vocabulary of the token strings
+    :param sentenceTokens: array with the token ids of all sentences
+    :param sentenceIndptr: array with the start of each sentence in sentenceTokens and the end of the last one
+    """
+
+    tokens.save(directory)
+    arrays = {}
+    arrays["sentenceTokens"] = np.asarray(sentenceTokens, dtype = np.int32)
+    arrays["sentenceIndptr"] = np.asarray(sentenceIndptr, dtype = np.int64)
+    for name, values in arrays.items():
+        np.save(os.path.join(directory, name + ".npy"), values)
+
+
+def writeSentences(sentences, directory, senses = None, chunkSize = None):
+    """
+    Write a dataset with each cleaned sentence stored once as token ids, and the instances in a CSV file
+    with the sentence and the target position that is left out of the context.
+
+    :param sentences: iterable of tuples of the lemmas and the instances of each sentence, as returned by readSentence
+    :param directory: directory to write the dataset to
+    :param senses: DataFrame with the columns <id, sense_class> to join with, if the dataset is the training set
+    :param chunkSize: number of instances to write at a time, or None to write all instances at once
+    """
+
+    os.makedirs(directory, exist_ok = True)
+    tokens = Vocabulary()
+    sentenceTokens = array("i")
+    sentenceIndptr = array("q", [0])
+
+    def rows():
+        for context, instances in sentences:
+            if not instances:
+                continue
+            context = cleanContext(context)
+            sentence = len(sentenceIndptr) - 1
+            sentenceTokens.extend(tokens.add(token) for token in context)
+            sentenceIndptr.append(len(sentenceTokens))
+            for instance, position in zip(instances, targetPositions(context, instances)):
+                yield {"id": instance[0], "target_word": instance[1], "pos": instance[2], "sentence": sentence, "position": position}
+
+    writeRows(rows(), os.path.join(directory, "instances.csv"), senses, chunkSize, INSTANCE_COLUMNS)
+    saveSentences(directory, tokens, sentenceTokens, sentenceIndptr)
+
+
+def outputPath(name, grouped):
+    """
+    :param name: dataset file name
+    :param grouped: boolean value - is the dataset stored with its sentences?
+    :return: path to the directory or the CSV file of the cleaned dataset
+    """
+
+    return "data/cleaned/" + name + ("" if grouped else ".csv")
+
+
+def removeSentences(name):
+    """
+    Remove the directory of a dataset stored with its sentences, so the outdated sentences are not loaded instead of a new CSV file.
+    CSV files are never removed: a dataset can be stored in both formats, and datasets.loadTestDatasets chooses which one to load.
+
+    :param name: dataset file name
+    """
+
+    path = outputPath(name, True)
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+
+
+def preprocess(name, goldKeyFilePath, xmlFilePath, isTrainingSet, streaming = False, chunkSize = 10000, grouped = None):
     """
     Parse XML file and preprocess dataset:
     Perform lemmatization, remove punctuation, stopwords and forbidden words, convert to lowercase and remove numbers.
@@ -15,58 +285,181 @@ def preprocess(name, goldKeyFilePath, xmlFilePath, isTrainingSet):
     :param goldKeyFilePath: file path to the gold key file
     :param xmlFilePath: file path to the XML file
     :param isTrainingSet: boolean value - is the dataset used as training dataset?
+    :param streaming: boolean value - parse the XML file incrementally and write the CSV file in chunks?
+    :param chunkSize: number of rows to write at a time when streaming
+    :param grouped: boolean value - store each sentence once with writeSentences instead of a CSV file with a context per row?
+                    By default the test datasets are grouped, and the training dataset is a CSV file that Naive Bayes is trained from in chunks
     """
 
     print("Processing ", name)
 
-    # List of rows to insert into dataframe
-    rows_list = []
-
     # Load gold key file with senses if dataset is training set
+    senses = None
     if isTrainingSet:
         senses = pd.read_table(goldKeyFilePath, header = None, sep = ' ', names=['id', 'sense_class'])
-    
-    # Load XML file
-    xmlTree = ET.parse(xmlFilePath)
-    corpus = xmlTree.getroot()
-
-    # Want to clean data: remove stopwords and other non-words
-    forbidden_words =  ["&apos;", "``", "''", "'", "`", "'s"] 
-
-    for text in corpus:
-        for sentence in text:
-            context = []
-            instances = []
-            for word in sentence:
-                context.append(word.attrib["lemma"])
-                if word.tag == "instance":
-                    instances.append((word.attrib["id"], word.attrib["lemma"]))
-            
-            # Ensure lower-case an remove punctuation, numbers, non-words and stopwords
-            context = [word.lower() for word in context if not word in punctuation and not word.isnumeric() and word not in forbidden_words and word not in stopwords.words('english')]
-            for instance in instances:
-
-                # Remove target_word from context if it exists
-                contextCopy = copy.deepcopy(context)
-                target_word = instance[1]
-                if target_word in contextCopy:
-                    index = contextCopy.index(target_word)
-                    contextCopy.pop(index)
-                contextCopy = " ".join(contextCopy)
-
-                row_dict = {"id": instance[0], "target_word": instance[1], "context_string": contextCopy}
-                rows_list.append(row_dict)
-
-
-    cleaned_data = pd.DataFrame(rows_list) 
-
-    # Join with the gold key file if the dataset is the training set
-    if isTrainingSet:
-        cleaned_data = cleaned_data.set_index('id').join(senses.set_index('id'))
 
-    cleaned_data.to_csv("data/cleaned/" + name + ".csv", index = False)
+    if grouped is None:
+        grouped = not isTrainingSet
+
+    if streaming:
+        sentences = iterateSentenceElements(xmlFilePath)
+    else:
+        # Load XML file
+        corpus = metrics.timedCall("preprocess.xmlParse", ET.parse, xmlFilePath).getroot()
+        sentences = (sentence for text in corpus for sentence in text)
+        chunkSize = None
+
+    if grouped:
+        writeSentences((readSentence(sentence) for sentence in sentences), outputPath(name, True), senses, chunkSize)
+    else:
+        writeRows((row for sentence in sentences for row in sentenceRows(sentence)), outputPath(name, False), senses, chunkSize)
+        removeSentences(name)
 
     print("Processing ", name, " finished")
     print("")
 
 
+def findShards(xmlFilePath, shardSize):
+    """
+    Split an XML file at <text> boundaries into byte ranges of roughly shardSize bytes.
+
+    :param xmlFilePath: file path to the XML file
+    :param shardSize: approximate number of bytes in a shard
+    :return: tuple of the bytes before the first text, and a list of (start, end) byte ranges of the shards
+    """
+
+    with open(xmlFilePath, "rb") as file, mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ) as data:
+        textOffsets = [match.start() for match in re.finditer(rb"<text[\s>]", data)]
+        if not textOffsets:
+            return b"", []
+        end = data.rfind(b"</corpus>")
+        header = data[:textOffsets[0]]
+
+    shards = []
+    start = textOffsets[0]
+    for offset in textOffsets[1:]:
+        if offset - start >= shardSize:
+            shards.append((start, offset))
+            start = offset
+    shards.append((start, end))
+    return header, shards
+
+
+def preprocessShard(xmlFilePath, header, start, end, outputFilePath, goldKeyFilePath, isTrainingSet, chunkSize, grouped = False):
+    """
+    Preprocess the texts in a byte range of an XML file and write them to a partial CSV file, or a partial dataset directory if grouped.
+
+    :param xmlFilePath: file path to the XML file
+    :param header: bytes before the first text in the XML file
+    :param start: first byte of the shard
+    :param end: byte after the last byte of the shard
+    :param outputFilePath: file path to the partial CSV file
+    :param goldKeyFilePath: file path to the gold key file
+    :param isTrainingSet: boolean value - is the dataset used as training dataset?
+    :param chunkSize: number of rows to write at a time
+    :param grouped: boolean value - store each sentence once with writeSentences?
+    """
+
+    senses = None
+    if isTrainingSet:
+        senses = pd.read_table(goldKeyFilePath, header = None, sep = ' ', names=['id', 'sense_class'])
+
+    with open(xmlFilePath, "rb") as file:
+        file.seek(start)
+        shard = io.BytesIO(header + file.read(end - start) + b"</corpus>")
+
+    if grouped:
+        writeSentences(iterateSentences(shard), outputFilePath, senses, chunkSize)
+    else:
+        writeRows(iterateRows(shard), outputFilePath, senses, chunkSize)
+
+
+def mergeShards(shardFilePaths, outputFilePath):
+    """
+    Concatenate partial CSV files in order, keeping the header of the first one, and remove them.
+
+    :param shardFilePaths: list of file paths to the partial CSV files
+    :param outputFilePath: file path to the merged CSV file
+    """
+
+    with open(outputFilePath, "wb") as output:
+        for index, shardFilePath in enumerate(shardFilePaths):
+            with open(shardFilePath, "rb") as shard:
+                if index > 0:
+                    shard.readline()
+                shutil.copyfileobj(shard, output)
+            os.remove(shardFilePath)
+
+
+def mergeSentenceShards(shardDirectories, outputDirectory):
+    """
+    Merge partial datasets written by writeSentences in order, and remove them.
+
+    :param shardDirectories: list of directories of the partial datasets
+    :param outputDirectory: directory of the merged dataset
+    """
+
+    os.makedirs(outputDirectory, exist_ok = True)
+    stores = [SentenceStore.load(shardDirectory) for shardDirectory in shardDirectories]
+    tokens = Vocabulary()
+    sentenceTokens = []
+    sentenceIndptr = [np.zeros(1, dtype = np.int64)]
+    sentenceOffset = 0
+    tokenOffset = 0
+
+    with open(os.path.join(outputDirectory, "instances.csv"), "w", encoding = "utf-8", newline = "") as output:
+        for index, (shardDirectory, store) in enumerate(zip(shardDirectories, stores)):
+            tokenMap = tokens.encode(store.tokens, add = True)
+            sentenceTokens.append(tokenMap[store.sentenceTokens])
+            sentenceIndptr.append(store.sentenceIndptr[1:] + tokenOffset)
+            tokenOffset += len(store.sentenceTokens)
+
+            # Read the instances as strings, so they are written back unchanged, and move them to the merged sentence ids
+            instances = pd.read_csv(os.path.join(shardDirectory, "instances.csv"), dtype = str, keep_default_na = False)
+            instances["sentence"] = instances["sentence"].astype(np.int64) + sentenceOffset
+            instances.to_csv(output, index = False, header = index == 0)
+            sentenceOffset += len(store)
+            shutil.rmtree(shardDirectory)
+
+    saveSentences(outputDirectory, tokens, np.concatenate(sentenceTokens), np.concatenate(sentenceIndptr))
+
+
+def preprocessParallel(datasets, workers = None, shardSize = 8 * 2**20, chunkSize = 10000):
+    """
+    Preprocess several datasets in a process pool. XML files larger than shardSize bytes are split at <text>
+    boundaries and the shards are processed in parallel, then merged into one dataset with the rows in order.
+
+    :param datasets: list of dictionaries with the keys <name, goldKeyFp, xmlFp, isTrainingSet[, grouped]>, see preprocess for grouped
+    :param workers: number of worker processes, by default the number of processors
+    :param shardSize: approximate number of bytes in a shard
+    :param chunkSize: number of rows to write at a time
+    """
+
+    with ProcessPoolExecutor(workers, initializer = metrics.initializeWorker, initargs = (metrics.ENABLED,)) as executor:
+        jobs = []
+        for dataset in datasets:
+            grouped = dataset.get("grouped", not dataset["isTrainingSet"])
+            header, shards = findShards(dataset["xmlFp"], shardSize)
+
+            if len(shards) <= 1:
+                futures = [executor.submit(metrics.collectCall, preprocess, dataset["name"], dataset["goldKeyFp"], dataset["xmlFp"], dataset["isTrainingSet"], streaming = True, chunkSize = chunkSize, grouped = grouped)]
+                jobs.append((dataset, grouped, futures, None))
+                continue
+
+            print("Processing ", dataset["name"], " in ", len(shards), " shards")
+            shardFilePaths = [outputPath(dataset["name"], grouped) + ".part" + str(index) for index in range(len(shards))]
+            futures = [executor.submit(metrics.collectCall, preprocessShard, dataset["xmlFp"], header, start, end, shardFilePath, dataset["goldKeyFp"], dataset["isTrainingSet"], chunkSize, grouped)
+                       for (start, end), shardFilePath in zip(shards, shardFilePaths)]
+            jobs.append((dataset, grouped, futures, shardFilePaths))
+
+        for dataset, grouped, futures, shardFilePaths in jobs:
+            for future in futures:
+                metrics.mergeResult(future.result())
+            if shardFilePaths is not None:
+                if grouped:
+                    mergeSentenceShards(shardFilePaths, outputPath(dataset["name"], True))
+                else:
+                    mergeShards(shardFilePaths, outputPath(dataset["name"], False))
+                    removeSentences(dataset["name"])
+                print("Processing ", dataset["name"], " finished")
+                print("")
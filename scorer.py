@@ -0,0 +1,138 @@
+import pandas as pd
+import glob
+import os
+import re
+from datasets import GOLD_KEY_FILES
+
+# Name of the system in the results table for each results directory, in table order
+SYSTEMS = {
+    "lesk": "Simplified Lesk",
+    "naiveBayes": "Naive Bayes",
+    "mostFreq": "Most Frequent Sense",
+}
+
+# Column of each dataset in the results table, in table order
+COLUMNS = {
+    "allTest": "ALL",
+    "senseval2": "S2",
+    "senseval3": "S3",
+    "semeval2007": "S7",
+    "semeval2013": "S13",
+    "semeval2015": "S15",
+}
+
+
+def readFile(filePath):
+    """
+    Read a key file with an id followed by one or more answers separated by spaces on each line,
+    in the same way as Scorer.readFile: incomplete lines are reported and skipped, and repeated ids add to the answers.
+
+    :param filePath: file path to the key file
+    :return: DataFrame with the distinct <id, answer> pairs
+    """
+
+    pairs = []
+    with open(filePath, encoding = "utf-8") as file:
+        for count, line in enumerate(file, start = 1):
+            fields = line.rstrip("\r\n").split(" ")
+
+            # Like Java's String.split, trailing empty fields are removed
+            while fields and fields[-1] == "":
+                fields.pop()
+            if len(fields) < 2:
+                print("line number " + str(count) + " not complete: " + line.rstrip("\r\n"))
+                continue
+            pairs += [(fields[0], answer) for answer in fields[1:]]
+
+    return pd.DataFrame(pairs, columns = ["id", "answer"]).drop_duplicates()
+
+
+def findResults(pattern = "results/*/*_predicted.txt"):
+    """
+    Find the results files and the system and dataset of each of them.
+
+    :param pattern: glob pattern of the results files, named <prefix>_<dataset>_predicted.txt in a directory per system
+    :return: list of (system, dataset, file path) tuples
+    """
+
+    results = []
+    for filePath in sorted(glob.glob(pattern)):
+        match = re.fullmatch(r"[^_]+_(.+)_predicted\.txt", os.path.basename(filePath))
+        if match is None:
+            continue
+        system = os.path.basename(os.path.dirname(filePath))
+        results.append((SYSTEMS.get(system, system), match.group(1), filePath))
+    return results
+
+
+def score(results):
+    """
+    Compute precision, recall and F1-score of several system outputs, in the same way as Scorer.score:
+    answers for ids that are not in the gold standard are skipped, and an id with several answers gets
+    the fraction of its answers that are correct. Each gold standard file is read once.
+
+    :param results: list of (system, dataset, file path) tuples, where dataset is a key of GOLD_KEY_FILES
+    :return: DataFrame with the columns <system, dataset, precision, recall, f1>
+    """
+
+    gold = pd.concat([readFile(GOLD_KEY_FILES[dataset]).assign(dataset = dataset) for dataset in sorted({dataset for _, dataset, _ in results})], ignore_index = True)
+    goldSizes = gold.groupby("dataset")["id"].nunique()
+
+    system = pd.concat([readFile(filePath).assign(system = name, dataset = dataset) for name, dataset, filePath in results], ignore_index = True)
+
+    # Skip ids that are not in the gold standard
+    system = system.merge(gold[["dataset", "id"]].drop_duplicates(), on = ["dataset", "id"])
+
+    # Mark the answers that are in the gold standard
+    gold["correct"] = 1.0
+    system = system.merge(gold, on = ["dataset", "id", "answer"], how = "left")
+    system["correct"] = system["correct"].fillna(0.0)
+
+    # Handle multiple answers for a same id
+    perId = system.groupby(["system", "dataset", "id"])["correct"].agg(["sum", "count"])
+    perId["ok"] = perId["sum"] / perId["count"]
+    perId["notok"] = (perId["count"] - perId["sum"]) / perId["count"]
+    totals = perId.groupby(["system", "dataset"])[["ok", "notok"]].sum()
+
+    scores = pd.DataFrame({"system": [name for name, _, _ in results], "dataset": [dataset for _, dataset, _ in results]})
+    scores = scores.join(totals, on = ["system", "dataset"]).fillna({"ok": 0.0, "notok": 0.0})
+    scores["precision"] = scores["ok"] / (scores["ok"] + scores["notok"])
+    scores["recall"] = scores["ok"] / scores["dataset"].map(goldSizes)
+    scores["f1"] = (2 * scores["precision"] * scores["recall"]) / (scores["precision"] + scores["recall"])
+    scores.loc[scores["precision"] + scores["recall"] == 0, "f1"] = 0.0
+
+    return scores[["system", "dataset", "precision", "recall", "f1"]]
+
+
+def formatTable(scores, measure = "f1"):
+    """
+    Format a measure of the scores as the results table in the README, in percent with one decimal.
+
+    :param scores: DataFrame returned by score
+    :param measure: column of the measure to show
+    :return: the table as a Markdown string
+    """
+
+    table = scores.pivot(index = "system", columns = "dataset", values = measure)
+    systems = [name for name in SYSTEMS.values() if name in table.index] + [name for name in table.index if name not in SYSTEMS.values()]
+    datasets = [dataset for dataset in COLUMNS if dataset in table.columns]
+
+    width = max(len("System"), max(len(name) for name in systems))
+    lines = ["| " + "System".ljust(width) + " | " + " | ".join(COLUMNS[dataset].ljust(4) for dataset in datasets) + " |",
+             "| " + "-" * width + " | " + " | ".join("-" * max(4, len(COLUMNS[dataset])) for dataset in datasets) + " |"]
+    for name in systems:
+        values = ["%.1f" % (table.at[name, dataset] * 100) for dataset in datasets]
+        lines.append("| " + name.ljust(width) + " | " + " | ".join(value.ljust(max(4, len(COLUMNS[dataset]))) for value, dataset in zip(values, datasets)) + " |")
+    return "\n".join(lines)
+
+
+def main():
+    scores = score(findResults())
+    for measure, title in [("precision", "P"), ("recall", "R"), ("f1", "F1")]:
+        print(title)
+        print(formatTable(scores, measure))
+        print("")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from nltk import pos_tag
+from nltk.tokenize import word_tokenize
+from nltk.stem import WordNetLemmatizer
+from preprocess import cleanContext, instanceRows
+from classifiers import ALGORITHMS, createClassifier
+from MostFrequentSense import WORDNET_POS
+import metrics
+
+lemmatizer = WordNetLemmatizer()
+
+# Part of speech of the pos attributes in the XML files for the first letter of each Penn Treebank tag
+PENN_POS = {"N": "NOUN", "V": "VERB", "J": "ADJ", "R": "ADV"}
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+def loadClassifiers(algorithms):
+    """
+    Load the saved models of the classifiers.
+
+    :param algorithms: list of algorithm names, keys of classifiers.ALGORITHMS
+    :return: dictionary with key: algorithm name, value: classifier ready to classify
+    """
+
+    return {algorithm: createClassifier(algorithm) for algorithm in algorithms}
+
+
+def sentenceTokens(sentence):
+    """
+    Tokenize a raw sentence, tag the part of speech of each word and lemmatize the word with it,
+    so the tokens are like the words of the XML files with their lemma and pos attributes.
+
+    :param sentence: the sentence
+    :return: list of dictionaries with the keys <lemma, pos>
+    """
+
+    tokens = []
+    for word, tag in pos_tag(word_tokenize(sentence)):
+        pos = PENN_POS.get(tag[:1], "")
+        lemma = lemmatizer.lemmatize(word.lower(), WORDNET_POS[pos]) if pos else lemmatizer.lemmatize(word.lower())
+        tokens.append({"lemma": lemma, "pos": pos})
+    return tokens
+
+
+def requestRows(request):
+    """
+    Create the instances of a request, cleaned in the same way as the datasets by preprocess.
+    A request contains either a raw "sentence", which is tokenized, tagged and lemmatized, or a list of "tokens",
+    which are lemmas or objects with the keys <lemma[, pos][, target]>. Without target flags,
+    every word that is kept in the cleaned context is disambiguated.
+
+    :param request: dictionary decoded from the JSON request
+    :return: list of dictionaries with the keys <id, target_word, context_string, pos>
+    """
+
+    if not isinstance(request, dict):
+        raise ValueError("The request must be a JSON object")
+    if isinstance(request.get("sentence"), str):
+        tokens = sentenceTokens(request["sentence"])
+    elif isinstance(request.get("tokens"), list):
+        tokens = [token if isinstance(token, dict) else {"lemma": token} for token in request["tokens"]]
+    else:
+        raise ValueError("The request needs a sentence string or a list of tokens")
+    if not all(isinstance(token.get("lemma"), str) and isinstance(token.get("pos", ""), str) for token in tokens):
+        raise ValueError("Each token needs a lemma string, and its pos must be a string")
+
+    context = [token["lemma"] for token in tokens]
+    hasTargets = any("target" in token for token in tokens)
+
+    instances = []
+    for index, token in enumerate(tokens):
+        isTarget = token.get("target", False) if hasTargets else len(cleanContext([token["lemma"]])) > 0
+        if isTarget:
+            instances.append(("t%03d" % index, token["lemma"], token.get("pos", "")))
+    return list(instanceRows(context, instances))
+
+
+class MicroBatcher:
+    """
+    Collects the instances of concurrent requests into batches that are classified together.
+    """
+
+    def __init__(self, classifiers, maxBatchSize = 256, maxDelay = 0.005):
+        self.classifiers = classifiers          # Dictionary with key: algorithm name, value: classifier
+        self.maxBatchSize = maxBatchSize        # Maximum number of instances in a batch
+        self.maxDelay = maxDelay                # Seconds to wait for more requests after the first one of a batch
+        self.queue = None                       # Queue of (rows, future) tuples waiting to be classified
+        self.executor = ThreadPoolExecutor(1)   # Classification runs outside the event loop, one batch at a time
+        self.batchSizes = deque(maxlen = 10000) # Number of instances in the recent batches
+        self.task = None
+
+
+    def start(self):
+        """
+        Start classifying batches from the queue. Must be called from the event loop.
+        """
+
+        self.queue = asyncio.Queue()
+        self.task = asyncio.ensure_future(self.run())
+
+
+    async def classify(self, rows):
+        """
+        Classify the instances of a request as part of a batch.
+
+        :param rows: list of dictionaries with the keys <id, target_word, context_string, pos>
+        :return: list with a dictionary with key: algorithm name, value: predicted sense class, for each row
+        """
+
+        if not rows:
+            return []
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((rows, future))
+        return await future
+
+
+    async def run(self):
+        """
+        Collect requests into batches and classify them until cancelled.
+        """
+
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.maxDelay
+            while size < self.maxBatchSize:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+                size += len(batch[-1][0])
+
+            self.batchSizes.append(size)
+            try:
+                predictions = await loop.run_in_executor(self.executor, self.classifyBatch, [rows for rows, _ in batch])
+                for (_, future), requestPredictions in zip(batch, predictions):
+                    if not future.cancelled():
+                        future.set_result(requestPredictions)
+            except Exception as exception:
+                for _, future in batch:
+                    if not future.cancelled():
+                        future.set_exception(exception)
+
+
+    def classifyBatch(self, requests):
+        """
+        Classify the instances of several requests with every classifier.
+
+        :param requests: list with the list of rows of each request
+        :return: list with the predictions of each request, as returned by classify
+        """
+
+        data = pd.DataFrame([row for rows in requests for row in rows], columns = ["id", "target_word", "context_string", "pos"])
+        predicted = {algorithm: list(classifier.classifyBatch(data)) for algorithm, classifier in self.classifiers.items()}
+        metrics.increment("server.batches")
+        metrics.increment("server.instances", len(data))
+
+        predictions = []
+        start = 0
+        for rows in requests:
+            predictions.append([{algorithm: predicted[algorithm][index] for algorithm in self.classifiers} for index in range(start, start + len(rows))])
+            start += len(rows)
+        return predictions
+
+
+class WSDServer:
+    """
+    HTTP server that disambiguates sentences with classifiers kept in memory.
+    POST /disambiguate with a JSON request as described in requestRows, and GET /stats for latency statistics.
+    """
+
+    def __init__(self, classifiers, maxBatchSize = 256, maxDelay = 0.005):
+        self.batcher = MicroBatcher(classifiers, maxBatchSize, maxDelay)
+        self.latencies = deque(maxlen = 10000)  # Latency of the recent requests in milliseconds
+        self.requests = 0                       # Number of handled requests
+
+
+    async def disambiguate(self, request):
+        """
+        Disambiguate the words of a request.
+
+        :param request: dictionary decoded from the JSON request
+        :return: dictionary with the instances and their predicted sense classes
+        """
+
+        start = time.perf_counter()
+        rows = requestRows(request)
+        predictions = await self.batcher.classify(rows)
+
+        latency = (time.perf_counter() - start) * 1000
+        self.latencies.append(latency)
+        self.requests += 1
+        instances = [{"id": row["id"], "target_word": row["target_word"], "predictions": rowPredictions} for row, rowPredictions in zip(rows, predictions)]
+        return {"instances": instances, "latencyMs": latency}
+
+
+    def stats(self):
+        """
+        Get latency and batching statistics.
+
+        :return: dictionary with the statistics of the recent requests
+        """
+
+        stats = {"requests": self.requests}
+        if self.latencies:
+            stats["latencyP50Ms"] = float(np.percentile(self.latencies, 50))
+            stats["latencyP99Ms"] = float(np.percentile(self.latencies, 99))
+        if self.batcher.batchSizes:
+            stats["meanBatchSize"] = float(np.mean(self.batcher.batchSizes))
+        stats.update(metrics.report())
+        return stats
+
+
+    async def handle(self, reader, writer):
+        """
+        Handle one HTTP request on a connection.
+
+        :param reader: stream to read the request from
+        :param writer: stream to write the response to
+        """
+
+        try:
+            status, response = await self.respond(reader)
+        except Exception as exception:
+            status, response = 500, {"error": str(exception)}
+
+        body = json.dumps(response).encode("utf-8")
+        writer.write(("HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\nConnection: close\r\n\r\n" % (status, HTTP_REASONS[status], len(body))).encode("ascii") + body)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+
+    async def respond(self, reader):
+        """
+        Read an HTTP request and create the response.
+
+        :param reader: stream to read the request from
+        :return: tuple of the HTTP status and the response
+        """
+
+        requestLine = (await reader.readline()).decode("latin-1").split()
+        if len(requestLine) < 2:
+            return 400, {"error": "Malformed request line"}
+        method, path = requestLine[0], requestLine[1]
+
+        contentLength = 0
+        while True:
+            header = (await reader.readline()).decode("latin-1").strip()
+            if not header:
+                break
+            name, _, value = header.partition(":")
+            if name.strip().lower() == "content-length":
+                try:
+                    contentLength = int(value.strip())
+                except ValueError:
+                    contentLength = -1
+                if contentLength < 0:
+                    return 400, {"error": "Invalid Content-Length " + value.strip()}
+
+        if path == "/stats":
+            return 200, self.stats()
+        if path != "/disambiguate":
+            return 404, {"error": "Unknown path " + path}
+        if method != "POST":
+            return 405, {"error": "Use POST"}
+
+        try:
+            request = json.loads(await reader.readexactly(contentLength))
+        except asyncio.IncompleteReadError:
+            return 400, {"error": "The body is shorter than its Content-Length"}
+        except ValueError as exception:
+            return 400, {"error": "Invalid JSON: " + str(exception)}
+
+        try:
+            return 200, await self.disambiguate(request)
+        except ValueError as exception:
+            return 400, {"error": str(exception)}
+
+
+    async def serve(self, host = "127.0.0.1", port = 8080, unixSocket = None):
+        """
+        Serve requests until cancelled.
+
+        :param host: host to listen on
+        :param port: port to listen on
+        :param unixSocket: file path of a Unix socket to listen on instead of the host and port
+        """
+
+        self.batcher.start()
+        if unixSocket:
+            server = await asyncio.start_unix_server(self.handle, path = unixSocket)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        print("Listening on ", unixSocket or "%s:%d" % (host, port))
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Serve word sense disambiguation over HTTP.")
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--port", type = int, default = 8080)
+    parser.add_argument("--unix-socket", help = "file path of a Unix socket to listen on instead of the host and port")
+    parser.add_argument("--algorithms", nargs = "+", default = list(ALGORITHMS), choices = list(ALGORITHMS))
+    parser.add_argument("--max-batch-size", type = int, default = 256, help = "maximum number of instances classified together")
+    parser.add_argument("--max-delay-ms", type = float, default = 5, help = "milliseconds to wait for more requests before classifying a batch")
+    arguments = parser.parse_args()
+
+    classifiers = loadClassifiers(arguments.algorithms)
+    server = WSDServer(classifiers, arguments.max_batch_size, arguments.max_delay_ms / 1000)
+    asyncio.run(server.serve(arguments.host, arguments.port, arguments.unix_socket))
+
+
+if __name__ == '__main__':
+    main()
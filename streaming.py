@@ -0,0 +1,249 @@
+import argparse
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import parallel
+import metrics
+from datasets import SentenceReader
+from classifiers import ALGORITHMS, createClassifier
+
+
+def isTrainingSet(path):
+    """
+    :param path: path to a CSV file or a dataset stored with its sentences
+    :return: boolean value - is the dataset a training set, whose rows have a sense_class column?
+    """
+
+    filePath = os.path.join(path, "instances.csv") if os.path.isdir(path) else path
+    with open(filePath) as file:
+        return "sense_class" in file.readline().rstrip("\n").split(",")
+
+
+def findInputs(inputPath):
+    """
+    Find the cleaned datasets at a path: a CSV file, a dataset stored with its sentences, or a directory of those.
+    The training set is skipped in a directory of datasets. A dataset stored both ways is classified once, from its sentences.
+
+    :param inputPath: path to a cleaned dataset or a directory of cleaned datasets
+    :return: list of (dataset name, path) tuples
+    """
+
+    if os.path.isfile(inputPath):
+        return [(os.path.splitext(os.path.basename(inputPath))[0], inputPath)]
+    if os.path.exists(os.path.join(inputPath, "instances.csv")):
+        return [(os.path.basename(os.path.normpath(inputPath)), inputPath)]
+
+    inputs = []
+    for name in sorted(os.listdir(inputPath)):
+        path = os.path.join(inputPath, name)
+        if name.endswith(".csv") and os.path.isfile(path):
+            name = name[:-len(".csv")]
+
+            # The CSV file is kept next to the dataset stored with its sentences, which is preferred
+            if os.path.exists(os.path.join(inputPath, name, "instances.csv")):
+                continue
+        elif not os.path.exists(os.path.join(path, "instances.csv")):
+            continue
+        if isTrainingSet(path):
+            print("Skipping the training set ", path)
+            continue
+        inputs.append((name, path))
+    return inputs
+
+
+def readChunks(inputPath, chunkSize, skipChunks = 0, sentences = None):
+    """
+    Read a cleaned dataset in chunks, and remove rows with NaN values or, for a dataset stored with its sentences, an empty context.
+    For a dataset stored with its sentences, only the sentences of a chunk are loaded with it.
+
+    :param inputPath: path to a CSV file or a dataset stored with its sentences
+    :param chunkSize: number of rows in a chunk
+    :param skipChunks: number of chunks at the start of the dataset to skip
+    :param sentences: SentenceReader of the dataset, if it is stored with its sentences
+    :return: generator of tuples of a DataFrame and the SentenceStore it refers to, or None for a CSV file
+    """
+
+    filePath = inputPath if sentences is None else os.path.join(inputPath, "instances.csv")
+
+    # A range of skipped rows is turned into a set by pandas, so memory use would grow with the rows already classified
+    skippedRows = skipChunks * chunkSize
+    for chunk in pd.read_csv(filePath, chunksize = chunkSize, skiprows = lambda row: 0 < row <= skippedRows):
+        chunk = chunk.dropna()
+        if sentences is None:
+            yield chunk, None
+            continue
+        chunkSentences, sentenceIds = sentences.select(chunk["sentence"].to_numpy(dtype = np.int64))
+        chunk = chunk.assign(sentence = sentenceIds)
+        yield chunk[chunkSentences.contextLengths(chunk["sentence"], chunk["position"]) > 0], chunkSentences
+
+
+def classifyChunks(classifier, chunks, executor = None, window = 2):
+    """
+    Classify chunks in order. With a process pool, at most window chunks are read ahead, so memory use does not grow with the input.
+
+    :param classifier: classifier used when there is no process pool
+    :param chunks: iterable of tuples of a DataFrame and the SentenceStore it refers to, or None, see readChunks
+    :param executor: process pool whose workers were initialized with parallel.initializeWorker, or None to classify in this process
+    :param window: number of chunks that are classified at the same time
+    :return: generator of tuples of a chunk and the list of its predicted sense classes
+    """
+
+    if executor is None:
+        for chunk, sentences in chunks:
+            classifier.sentences = sentences
+            yield chunk, list(classifier.classifyBatch(chunk))
+        return
+
+    pending = deque()
+    for chunk, sentences in chunks:
+        pending.append((chunk, executor.submit(parallel.classifyChunk, chunk, sentences)))
+        if len(pending) >= window:
+            chunk, future = pending.popleft()
+            yield chunk, metrics.mergeResult(future.result())
+    while pending:
+        chunk, future = pending.popleft()
+        yield chunk, metrics.mergeResult(future.result())
+
+
+def inputState(inputPath, chunkSize):
+    """
+    :param inputPath: path to a cleaned dataset
+    :param chunkSize: number of rows in a chunk
+    :return: dictionary that identifies the input and the chunks of a run, to check that a run can be resumed
+    """
+
+    filePath = inputPath if os.path.isfile(inputPath) else os.path.join(inputPath, "instances.csv")
+    stat = os.stat(filePath)
+    return {"input": os.path.abspath(inputPath), "size": stat.st_size, "modified": stat.st_mtime_ns, "chunkSize": chunkSize}
+
+
+def readProgress(progressFilePath, state):
+    """
+    Read the progress of an interrupted run.
+
+    :param progressFilePath: file path to the progress file
+    :param state: dictionary returned by inputState for this run
+    :return: dictionary with the keys <chunks, outputBytes>, or None if there is no progress of a run on the same input with the same chunk size
+    """
+
+    if not os.path.exists(progressFilePath):
+        return None
+    with open(progressFilePath) as file:
+        progress = json.load(file)
+    if progress["state"] != state:
+        print("Not resuming ", progressFilePath, ": the input or the chunk size changed")
+        return None
+    return progress
+
+
+def writeProgress(progressFilePath, state, chunks, outputBytes):
+    """
+    Record the chunks that were classified and written. The file is replaced, so it is never left half written.
+
+    :param progressFilePath: file path to the progress file
+    :param state: dictionary returned by inputState for this run
+    :param chunks: number of chunks that were classified and written
+    :param outputBytes: size of the results file after the last written chunk
+    """
+
+    with open(progressFilePath + ".tmp", "w") as file:
+        json.dump({"state": state, "chunks": chunks, "outputBytes": outputBytes}, file)
+    os.replace(progressFilePath + ".tmp", progressFilePath)
+
+
+def classifyStream(classifier, factory, inputPath, outputFilePath, workers = 1, chunkSize = 10000, resume = True):
+    """
+    Classify a cleaned dataset in chunks and append the predictions of each chunk to the results file as it is classified.
+    After each chunk, the number of chunks done and the size of the results file are saved to <outputFilePath>.progress,
+    so an interrupted run continues after the last written chunk.
+
+    :param classifier: classifier used when there is only one worker
+    :param factory: function without arguments that returns a classifier ready to classify, called once in each worker
+    :param inputPath: path to a CSV file or a dataset stored with its sentences
+    :param outputFilePath: file path to the results file
+    :param workers: number of worker processes
+    :param chunkSize: number of rows in a chunk
+    :param resume: boolean value - continue an interrupted run? Otherwise the results file is written from the start
+    """
+
+    progressFilePath = outputFilePath + ".progress"
+    state = inputState(inputPath, chunkSize)
+    progress = readProgress(progressFilePath, state) if resume else None
+    if progress and (not os.path.exists(outputFilePath) or os.path.getsize(outputFilePath) < progress["outputBytes"]):
+        print("Not resuming ", progressFilePath, ": the results file is missing or shorter than the saved progress")
+        progress = None
+    chunks = progress["chunks"] if progress else 0
+
+    sentences = None
+    if os.path.isdir(inputPath):
+        sentences = SentenceReader(inputPath)
+
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(workers, initializer = parallel.initializeWorker, initargs = (factory, None, metrics.ENABLED))
+
+    os.makedirs(os.path.dirname(outputFilePath) or ".", exist_ok = True)
+    try:
+        with open(outputFilePath, "r+b" if progress else "wb") as output:
+            if progress:
+                print("Resuming ", inputPath, " after ", chunks, " chunks")
+                # Remove predictions written after the last saved progress
+                output.truncate(progress["outputBytes"])
+                output.seek(progress["outputBytes"])
+
+            for chunk, predicted in classifyChunks(classifier, readChunks(inputPath, chunkSize, chunks, sentences), executor, 2 * workers):
+                results = pd.DataFrame({"id": chunk["id"].to_numpy(), "predicted": predicted})
+                output.write(results.to_csv(sep = ' ', header = False, index = False).encode("utf-8"))
+                output.flush()
+                os.fsync(output.fileno())
+
+                chunks += 1
+                writeProgress(progressFilePath, state, chunks, output.tell())
+                metrics.increment("streaming.chunks")
+                metrics.increment("streaming.instances", len(chunk))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    # The run is complete, so there is nothing to resume
+    if os.path.exists(progressFilePath):
+        os.remove(progressFilePath)
+
+
+def classifyPath(classifier, factory, inputPath, outputFilePath, workers = 1, chunkSize = 10000, resume = True):
+    """
+    Classify every cleaned dataset at a path with classifyStream.
+
+    :param classifier: classifier used when there is only one worker
+    :param factory: function without arguments that returns a classifier ready to classify, called once in each worker
+    :param inputPath: path to a cleaned dataset or a directory of cleaned datasets, see findInputs
+    :param outputFilePath: file path of the results, with {} in place of the dataset name
+    :param workers: number of worker processes
+    :param chunkSize: number of rows in a chunk
+    :param resume: boolean value - continue interrupted runs?
+    """
+
+    for name, path in findInputs(inputPath):
+        print("Classifying ", path)
+        classifyStream(classifier, factory, path, outputFilePath.format(name), workers, chunkSize, resume)
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Classify cleaned datasets of any size in chunks, resuming interrupted runs.")
+    parser.add_argument("input", help = "cleaned CSV file, dataset directory, or directory of those")
+    parser.add_argument("--algorithms", nargs = "+", default = list(ALGORITHMS), choices = list(ALGORITHMS))
+    parser.add_argument("--workers", type = int, default = 1, help = "number of worker processes")
+    parser.add_argument("--chunk-size", type = int, default = 10000, help = "number of rows classified at a time")
+    parser.add_argument("--restart", action = "store_true", help = "do not resume interrupted runs")
+    arguments = parser.parse_args()
+
+    for algorithm in arguments.algorithms:
+        classifier = createClassifier(algorithm)
+        classifyPath(classifier, classifier.getFactory(), arguments.input, ALGORITHMS[algorithm][1], arguments.workers, arguments.chunk_size, not arguments.restart)
+
+
+if __name__ == '__main__':
+    main()
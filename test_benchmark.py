@@ -0,0 +1,27 @@
+import os
+import pytest
+from conftest import requireNltkData
+from benchmark import benchmark, generateSyntheticCorpus, COMPRESSION_DIRECTORY, COMPRESSION_SETTINGS
+from datasets import ALL_TEST_DATASETS
+from NaiveBayesWSD import TRAINING_PATH
+
+
+@pytest.fixture
+def syntheticWorkspace(workspace):
+    """
+    Workspace with a synthetic corpus as training dataset.
+    """
+
+    requireNltkData()
+    return generateSyntheticCorpus(os.path.splitext(os.path.basename(TRAINING_PATH))[0], 200)
+
+
+def test_benchmarkCompression(syntheticWorkspace):
+    stages = benchmark(latencySample = 5, datasets = [syntheticWorkspace], compression = True)
+
+    for name in ["exact"] + list(COMPRESSION_SETTINGS):
+        measurements = stages["compression/naiveBayes/" + name]
+        assert measurements["modelMb"] > 0
+        assert set(measurements["f1"]) == set(ALL_TEST_DATASETS)
+        assert os.path.exists(os.path.join(COMPRESSION_DIRECTORY, name, "nb_allTest_predicted.txt"))
+    assert all(change == 0 for change in stages["compression/naiveBayes/exact"]["f1Change"].values())
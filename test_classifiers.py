@@ -0,0 +1,50 @@
+import os
+import shutil
+import pytest
+from conftest import ROOT, requireNltkData
+from datasets import loadTestDatasets, ALL_TEST_DATASETS
+from NaiveBayesWSD import MODEL_DIRECTORY, TRAINING_PATH
+from classifiers import ALGORITHMS, runAlgorithms
+
+
+@pytest.fixture
+def csvWorkspace(workspace):
+    """
+    Workspace with the models of the repository and the training dataset they are built from.
+    """
+
+    requireNltkData()
+    if not os.path.isdir(os.path.join(ROOT, MODEL_DIRECTORY)) and not os.path.exists(os.path.join(ROOT, TRAINING_PATH)):
+        pytest.skip("The Naive Bayes model and its training dataset do not exist, run main.py first")
+
+    if os.path.exists(os.path.join(ROOT, TRAINING_PATH)):
+        os.symlink(os.path.join(ROOT, TRAINING_PATH), workspace / TRAINING_PATH)
+    if os.path.isdir(os.path.join(ROOT, "models")):
+        shutil.copytree(os.path.join(ROOT, "models"), workspace / "models")
+    return workspace
+
+
+def readResults(directory):
+    results = {}
+    for algorithm, (_, outputFilePath) in ALGORITHMS.items():
+        for name in ALL_TEST_DATASETS:
+            with open(os.path.join(directory, outputFilePath.format(name))) as file:
+                results[algorithm, name] = file.read()
+    return results
+
+
+def test_runAlgorithmsMatchesEachClassifier(csvWorkspace):
+    for algorithm, (classifierClass, _) in ALGORITHMS.items():
+        classifier = classifierClass()
+        classifier.setData(*loadTestDatasets())
+        classifier.prepare()
+        classifier.runClassification()
+    os.mkdir("single")
+    os.rename("results", os.path.join("single", "results"))
+
+    runAlgorithms(workers = 2, chunkSize = 500)
+
+    single = readResults("single")
+    combined = readResults(".")
+    for key in single:
+        assert combined[key] == single[key], key
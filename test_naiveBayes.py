@@ -0,0 +1,51 @@
+import os
+import pytest
+from NaiveBayesWSD import NaiveBayesWSD, TRAINING_PATH
+
+TRAINING = "target_word,context_string,pos,sense_class\ndog,bark loud,NOUN,dog%1\ndog,tail wag,NOUN,dog%2\n"
+
+
+@pytest.fixture
+def trainingWorkspace(tmp_path, monkeypatch):
+    """
+    Working directory with a small training dataset, and a count of the times a model is trained.
+    """
+
+    (tmp_path / "data" / "cleaned").mkdir(parents = True)
+    monkeypatch.chdir(tmp_path)
+    with open(TRAINING_PATH, "w") as file:
+        file.write(TRAINING)
+
+    trainings = []
+    trainFromFile = NaiveBayesWSD.trainFromFile
+    monkeypatch.setattr(NaiveBayesWSD, "trainFromFile", lambda self, *args, **kwargs: trainings.append(1) or trainFromFile(self, *args, **kwargs))
+    return trainings
+
+
+def test_prepareTrainsAgainWhenTrainingDatasetChanges(trainingWorkspace):
+    NaiveBayesWSD().prepare()
+    naiveBayes = NaiveBayesWSD()
+    naiveBayes.prepare()
+    assert len(trainingWorkspace) == 1
+    assert not NaiveBayesWSD.isOutdated()
+    assert sorted(naiveBayes.classes) == ["dog%1", "dog%2"]
+
+    with open(TRAINING_PATH, "a") as file:
+        file.write("cat,meow,NOUN,cat%1\n")
+    assert NaiveBayesWSD.isOutdated()
+    naiveBayes = NaiveBayesWSD()
+    naiveBayes.prepare()
+    assert len(trainingWorkspace) == 2
+    assert not NaiveBayesWSD.isOutdated()
+    assert sorted(naiveBayes.classes) == ["cat%1", "dog%1", "dog%2"]
+
+
+def test_prepareLoadsModelWithoutTrainingDataset(trainingWorkspace):
+    NaiveBayesWSD().prepare()
+    os.remove(TRAINING_PATH)
+
+    assert not NaiveBayesWSD.isOutdated()
+    naiveBayes = NaiveBayesWSD()
+    naiveBayes.prepare()
+    assert len(trainingWorkspace) == 1
+    assert sorted(naiveBayes.classes) == ["dog%1", "dog%2"]
@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+from conftest import StubClassifier
+from datasets import uniqueInstances
+from parallel import runClassification
+
+COLUMNS = ["id", "target_word", "context_string", "pos"]
+
+SENSEVAL2 = pd.DataFrame([
+    ["d000.s000.t000", "dog", "bark loud", "NOUN"],
+    ["d000.s000.t001", "dog", "bark loud", "VERB"],
+    ["d000.s001.t000", "cat", "sleep", "NOUN"],
+    ["d000.s002.t000", "dog", "bark loud", "NOUN"],
+], columns = COLUMNS)
+
+# Union dataset with a copy of every instance of senseval2 and an instance of its own
+ALL_TEST = pd.concat([SENSEVAL2.assign(id = "senseval2." + SENSEVAL2["id"]),
+                      pd.DataFrame([["senseval3.d000.s000.t000", "cat", "purr", "NOUN"]], columns = COLUMNS)], ignore_index = True)
+
+
+class ContextClassifier(StubClassifier):
+    """
+    Predicts a sense class made of the target word, context and part of speech, and counts the classified rows.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.rows = 0   # Number of classified rows
+
+
+    def classifyBatch(self, data):
+        self.rows += len(data)
+        return data["target_word"] + "%" + data["context_string"].str.replace(" ", "_") + "%" + data["pos"]
+
+
+def test_uniqueInstances():
+    unique, positions = uniqueInstances({"senseval2": SENSEVAL2, "allTest": ALL_TEST})
+
+    assert len(unique) == 4
+    assert "id" not in unique
+    assert unique.iloc[positions["senseval2"]].reset_index(drop = True).equals(SENSEVAL2.drop(columns = ["id"]))
+    assert unique.iloc[positions["allTest"]].reset_index(drop = True).equals(ALL_TEST.drop(columns = ["id"]))
+    assert positions["senseval2"][0] == positions["senseval2"][3] == positions["allTest"][0]
+    assert positions["senseval2"][0] != positions["senseval2"][1]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_runClassificationClassifiesEachInstanceOnce(tmp_path, workers):
+    datasets = {"senseval2": SENSEVAL2, "allTest": ALL_TEST}
+    classifier = ContextClassifier()
+    results = runClassification(classifier, ContextClassifier, datasets, str(tmp_path / "stub_{}_predicted.txt"), workers, chunkSize = 2)
+
+    if workers == 1:
+        assert classifier.rows == 4
+    for name, data in datasets.items():
+        expected = pd.DataFrame({"id": data["id"], "predicted": ContextClassifier().classifyBatch(data)})
+        assert results[name].equals(expected)
+        assert (tmp_path / ("stub_%s_predicted.txt" % name)).read_text() == expected.to_csv(sep = ' ', header = False, index = False)
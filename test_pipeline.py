@@ -0,0 +1,75 @@
+import pytest
+import preprocess
+from pipeline import Stage, Manifest, runStage, preprocessStage
+
+
+@pytest.fixture
+def stageFiles(tmp_path, monkeypatch):
+    """
+    Working directory with an input file, a directory of inputs and a source file of a stage.
+    """
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "input.txt").write_text("input")
+    (tmp_path / "inputs").mkdir()
+    (tmp_path / "inputs" / "part0.txt").write_text("part")
+    (tmp_path / "stage.py").write_text("source")
+    return tmp_path
+
+
+def makeStage(parameters = None):
+    return Stage("test/stage", ["input.txt", "inputs"], ["output.txt"], parameters or {"alpha": 1}, ["stage.py"])
+
+
+def writeOutput(runs):
+    runs.append(1)
+    with open("output.txt", "w") as file:
+        file.write("output")
+
+
+@pytest.mark.parametrize("change", ["input", "directory", "source"])
+def test_stageKeyChangesWithFiles(stageFiles, change):
+    key = makeStage().key()
+    assert makeStage().key() == key
+
+    path = {"input": "input.txt", "directory": "inputs/part1.txt", "source": "stage.py"}[change]
+    (stageFiles / path).write_text("changed")
+    assert makeStage().key() != key
+
+
+def test_stageKeyChangesWithParameters(stageFiles):
+    assert makeStage({"alpha": 1}).key() != makeStage({"alpha": 2}).key()
+
+
+def test_runStageSkipsUpToDateStage(stageFiles):
+    runs = []
+    manifest = Manifest("manifest.json")
+    assert runStage(manifest, makeStage(), lambda: writeOutput(runs))
+    assert not runStage(Manifest("manifest.json"), makeStage(), lambda: writeOutput(runs))
+    assert runStage(Manifest("manifest.json"), makeStage(), lambda: writeOutput(runs), force = True)
+    assert len(runs) == 2
+
+
+@pytest.mark.parametrize("change", ["input", "parameters", "missingOutput"])
+def test_runStageRunsStaleStage(stageFiles, change):
+    runs = []
+    runStage(Manifest("manifest.json"), makeStage(), lambda: writeOutput(runs))
+
+    stage = makeStage()
+    if change == "input":
+        (stageFiles / "input.txt").write_text("changed")
+    elif change == "parameters":
+        stage = makeStage({"alpha": 2})
+    else:
+        (stageFiles / "output.txt").unlink()
+    assert runStage(Manifest("manifest.json"), stage, lambda: writeOutput(runs))
+    assert len(runs) == 2
+
+
+def test_preprocessStageKeyChangesWithStopwords(stageFiles, stubStopwords, monkeypatch):
+    dataset = {"name": "t", "goldKeyFp": "t.gold.key.txt", "xmlFp": "input.txt", "isTrainingSet": False}
+    key = preprocessStage(dataset).key()
+
+    monkeypatch.setattr(type(preprocess.stopwords), "words", lambda self, language: stubStopwords + ["new"])
+    preprocess.englishStopwords.cache_clear()
+    assert preprocessStage(dataset).key() != key
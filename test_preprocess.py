@@ -0,0 +1,49 @@
+import pandas as pd
+import pytest
+from datasets import loadSentenceDataset
+from preprocess import preprocessParallel
+
+# Corpus with a text without instances before a text with one instance
+CORPUS = """<?xml version="1.0" encoding="UTF-8" ?>
+<corpus lang="en" source="t">
+<text id="d000">
+<sentence id="d000.s000">
+<wf lemma="cat" pos="NOUN">cat</wf>
+<wf lemma="sleep" pos="VERB">sleeps</wf>
+</sentence>
+</text>
+<text id="d001">
+<sentence id="d001.s000">
+<instance id="d001.s000.t000" lemma="dog" pos="NOUN">dog</instance>
+<wf lemma="bark" pos="VERB">barks</wf>
+</sentence>
+</text>
+</corpus>
+"""
+
+
+@pytest.fixture
+def corpusWorkspace(tmp_path, monkeypatch, stubStopwords):
+    """
+    Working directory with a corpus whose first text has no instances.
+    """
+
+    (tmp_path / "t.data.xml").write_text(CORPUS)
+    (tmp_path / "t.gold.key.txt").write_text("d001.s000.t000 dog%1:05:00::\n")
+    (tmp_path / "data" / "cleaned").mkdir(parents = True)
+    monkeypatch.chdir(tmp_path)
+    return {"name": "t", "goldKeyFp": "t.gold.key.txt", "xmlFp": "t.data.xml"}
+
+
+@pytest.mark.parametrize("isTrainingSet", [False, True])
+def test_preprocessParallelShardWithoutInstances(corpusWorkspace, isTrainingSet):
+    dataset = dict(corpusWorkspace, isTrainingSet = isTrainingSet)
+    preprocessParallel([dataset], workers = 2, shardSize = 10)
+
+    if isTrainingSet:
+        data = pd.read_csv("data/cleaned/t.csv")
+        assert data.to_dict("records") == [{"target_word": "dog", "context_string": "bark", "pos": "NOUN", "sense_class": "dog%1:05:00::"}]
+    else:
+        data, sentences = loadSentenceDataset("data/cleaned/t")
+        assert data["id"].tolist() == ["d001.s000.t000"]
+        assert sentences.context(data["sentence"][0], data["position"][0]) == ["bark"]
@@ -0,0 +1,48 @@
+import pytest
+import scorer
+
+GOLD = "a x\nb y z\nc w\nd v\n"
+
+# a is correct, b has one correct answer out of two, c is wrong, e is not in the gold standard,
+# f is incomplete and d has no answer
+NAIVE_BAYES = "a x\nb y q\nc q\ne x\nf\n"
+LESK = "a q\n"
+
+
+@pytest.fixture
+def resultsWorkspace(tmp_path, monkeypatch):
+    """
+    Working directory with the results of two systems on a dataset and its gold standard.
+    """
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "gold.key.txt").write_text(GOLD)
+    monkeypatch.setattr(scorer, "GOLD_KEY_FILES", {"senseval2": "gold.key.txt"})
+    for system, prefix, content in [("naiveBayes", "nb", NAIVE_BAYES), ("lesk", "lesk", LESK)]:
+        (tmp_path / "results" / system).mkdir(parents = True)
+        (tmp_path / "results" / system / (prefix + "_senseval2_predicted.txt")).write_text(content)
+    (tmp_path / "results" / "lesk" / "notes.txt").write_text("")
+    return tmp_path
+
+
+def test_findResults(resultsWorkspace):
+    assert scorer.findResults() == [("Simplified Lesk", "senseval2", "results/lesk/lesk_senseval2_predicted.txt"),
+                                    ("Naive Bayes", "senseval2", "results/naiveBayes/nb_senseval2_predicted.txt")]
+
+
+def test_score(resultsWorkspace):
+    scores = scorer.score(scorer.findResults()).set_index("system")
+
+    assert scores.at["Naive Bayes", "precision"] == pytest.approx(0.5)
+    assert scores.at["Naive Bayes", "recall"] == pytest.approx(1.5 / 4)
+    assert scores.at["Naive Bayes", "f1"] == pytest.approx(2 * 0.5 * 0.375 / 0.875)
+    assert scores.loc["Simplified Lesk", ["precision", "recall", "f1"]].tolist() == [0.0, 0.0, 0.0]
+
+
+def test_formatTable(resultsWorkspace):
+    table = scorer.formatTable(scorer.score(scorer.findResults()))
+
+    assert table.splitlines() == ["| System          | S2   |",
+                                  "| --------------- | ---- |",
+                                  "| Simplified Lesk | 0.0  |",
+                                  "| Naive Bayes     | 42.9 |"]
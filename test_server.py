@@ -0,0 +1,74 @@
+import asyncio
+import json
+import pytest
+from conftest import StubClassifier
+from server import WSDServer, requestRows
+
+
+def respond(server, request):
+    """
+    Let the server read an HTTP request from a stream.
+
+    :return: tuple of the HTTP status and the response
+    """
+
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(request)
+        reader.feed_eof()
+        return await server.respond(reader)
+
+    return asyncio.run(run())
+
+
+def postRequest(body, contentLength = None):
+    return ("POST /disambiguate HTTP/1.1\r\nContent-Length: %s\r\n\r\n" % (len(body) if contentLength is None else contentLength)).encode("ascii") + body
+
+
+@pytest.mark.parametrize("rawRequest", [
+    b"\r\n",
+    postRequest(b"{}", "x"),
+    postRequest(b"{}", -1),
+    postRequest(b"{", 1),
+    postRequest(b"{}", 10),
+    postRequest(b"[]"),
+    postRequest(b'{"tokens": "dog"}'),
+    postRequest(b'{"tokens": [{"pos": "NOUN"}]}'),
+    postRequest(b'{"tokens": [{"lemma": "dog", "pos": 1}]}'),
+], ids = ["requestLine", "contentLengthNotNumber", "negativeContentLength", "invalidJson", "shortBody", "notObject", "tokensNotList", "noLemma", "posNotString"])
+def test_respondRejectsBadRequest(rawRequest):
+    status, response = respond(WSDServer({"stub": StubClassifier()}), rawRequest)
+
+    assert status == 400
+    assert "error" in response
+
+
+def test_respondUnknownPathAndMethod():
+    server = WSDServer({"stub": StubClassifier()})
+
+    assert respond(server, b"GET /other HTTP/1.1\r\n\r\n")[0] == 404
+    assert respond(server, b"GET /disambiguate HTTP/1.1\r\n\r\n")[0] == 405
+
+
+def test_disambiguateBatchesConcurrentRequests(stubStopwords):
+    classifier = StubClassifier()
+    server = WSDServer({"stub": classifier}, maxBatchSize = 256, maxDelay = 0.05)
+    requests = [{"tokens": ["the", "dog", "barks"]}, {"tokens": ["a", "cat"]}, {"tokens": [{"lemma": "bank", "pos": "NOUN", "target": True}, "river"]}]
+
+    async def run():
+        server.batcher.start()
+        try:
+            return await asyncio.gather(*[server.disambiguate(request) for request in requests])
+        finally:
+            server.batcher.task.cancel()
+
+    responses = asyncio.run(run())
+
+    assert classifier.batches == 1
+    assert list(server.batcher.batchSizes) == [sum(len(requestRows(request)) for request in requests)]
+    assert [[(instance["target_word"], instance["predictions"]["stub"]) for instance in response["instances"]] for response in responses] == [
+        [("dog", "dog%1:00:00::"), ("barks", "barks%1:00:00::")],
+        [("cat", "cat%1:00:00::")],
+        [("bank", "bank%1:00:00::")],
+    ]
+    assert json.loads(json.dumps(server.stats()))["requests"] == 3
@@ -0,0 +1,111 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+import SimplifiedLesk
+from SimplifiedLesk import SimplifiedLesk as Lesk
+from datasets import sentenceDatasets
+
+# Gloss of each synset of a fake WordNet, whose words are the signature of the synset
+GLOSSES = ["dog bark loud animal", "dog tail animal", "cat purr animal", "bank river water", "bank money u.s.", ""]
+
+
+class FakeWordNet:
+
+    version = "3.0"
+
+    def __len__(self):
+        return len(GLOSSES)
+
+
+    def definition(self, synsetId):
+        return GLOSSES[synsetId]
+
+
+    def examples(self, synsetId):
+        return []
+
+
+    def synsets(self, word):
+        return [synsetId for synsetId, gloss in enumerate(GLOSSES) if gloss.split()[:1] == [word]]
+
+
+    def senseKey(self, synsetId):
+        return "s%d" % synsetId
+
+
+@pytest.fixture
+def lesk(tmp_path, monkeypatch):
+    """
+    Factory of classifiers with the signature index of the fake WordNet, and tokenization by spaces, so no NLTK data is needed.
+    """
+
+    monkeypatch.setattr(Lesk, "preprocess", staticmethod(lambda text: sorted(set(text.split()))))
+    monkeypatch.setattr(SimplifiedLesk, "word_tokenize", str.split)
+    path = str(tmp_path / "signatureIndex")
+
+    def create(wordnet = None):
+        classifier = Lesk()
+        classifier.wordnet = wordnet or FakeWordNet()
+        classifier.loadIndex(path)
+        return classifier
+
+    return create
+
+
+def test_loadIndexMapsSavedPostings(lesk):
+    built = lesk()
+    loaded = lesk()
+
+    assert isinstance(loaded.postingSynsets, np.memmap) and isinstance(loaded.postingIndptr, np.memmap)
+    assert loaded.vocabulary.tokens == built.vocabulary.tokens
+    assert np.array_equal(loaded.postingIndptr, built.postingIndptr) and np.array_equal(loaded.postingSynsets, built.postingSynsets)
+    for tokenId, token in enumerate(loaded.vocabulary.tokens):
+        postings = loaded.postingSynsets[loaded.postingIndptr[tokenId]:loaded.postingIndptr[tokenId + 1]].tolist()
+        assert postings == [synsetId for synsetId, gloss in enumerate(GLOSSES) if token in gloss.split()]
+
+
+def test_loadIndexRebuildsForOtherWordNetVersion(lesk, tmp_path):
+    lesk()
+    wordnet = FakeWordNet()
+    wordnet.version = "3.1"
+    lesk(wordnet)
+
+    with open(tmp_path / "signatureIndex" / "index.json") as file:
+        assert json.load(file)["wordnetVersion"] == "3.1"
+
+
+def test_computeOverlaps(lesk):
+    classifier = lesk()
+    context = ["animal", "loud", "river", "unknown", "animal"]
+    candidates = [2, 0, 3, 5, 0]
+
+    overlaps = classifier.computeOverlaps(candidates, classifier.vocabulary.encode(context).tolist())
+    assert overlaps.tolist() == [sum(word in GLOSSES[synsetId].split() for word in context) for synsetId in candidates]
+    assert classifier.computeOverlaps(candidates, []).tolist() == [0] * len(candidates)
+
+
+def test_classifyBatch(lesk):
+    data = pd.DataFrame({"id": ["t0", "t1", "t2", "t3"], "target_word": ["dog", "dog", "bank", "horse"],
+                         "context_string": ["bark loud", "tail wag", "money", "animal"]}, index = [3, 5, 7, 9])
+
+    assert lesk().classifyBatch(data).to_dict() == {3: "s0", 5: "s1", 7: "s4", 9: "None"}
+
+
+def test_getContextIdsOfStoredSentences(lesk, monkeypatch):
+    # Like word_tokenize, split the final period of a text, so "u.s." is split at the end of a context but not inside it
+    def tokenize(text):
+        words = text.split()
+        if words and words[-1].endswith(".") and len(words[-1]) > 1:
+            words[-1:] = [words[-1][:-1], "."]
+        return words
+
+    monkeypatch.setattr(SimplifiedLesk, "word_tokenize", tokenize)
+    data = pd.DataFrame({"id": ["t0", "t1", "t2"], "target_word": ["dog", "bank", "cat"],
+                         "context_string": ["bark loud animal", "u.s. money river", "animal u.s."]})
+    converted, sentences = sentenceDatasets({"test": data})
+    classifier = lesk()
+    classifier.sentences = sentences
+
+    for row, groupedRow in zip(data.itertuples(), converted["test"].itertuples()):
+        assert classifier.getContextIds(groupedRow) == classifier.getContextIds(row)
@@ -0,0 +1,75 @@
+import json
+import os
+import pytest
+from conftest import StubClassifier
+from preprocess import preprocess, outputPath
+from streaming import classifyStream
+
+WORDS = ["cat", "dog", "bird", "fish", "horse", "tree", "river", "stone"]
+
+
+def writeCorpus(path, sentences):
+    """
+    Write a corpus where the first two words of each sentence are instances.
+    """
+
+    lines = ['<?xml version="1.0" encoding="UTF-8" ?>', '<corpus lang="en" source="s">', '<text id="d000">']
+    for sentence in range(sentences):
+        lines.append('<sentence id="d000.s%03d">' % sentence)
+        for position in range(4):
+            word = WORDS[(sentence + 3 * position) % len(WORDS)]
+            if position < 2:
+                lines.append('<instance id="d000.s%03d.t%03d" lemma="%s" pos="NOUN">%s</instance>' % (sentence, position, word, word))
+            else:
+                lines.append('<wf lemma="%s" pos="NOUN">%s</wf>' % (word, word))
+        lines.append('</sentence>')
+    lines += ['</text>', '</corpus>']
+    path.write_text("\n".join(lines) + "\n")
+
+
+@pytest.fixture(params = [False, True], ids = ["csv", "grouped"])
+def cleanedDataset(request, tmp_path, monkeypatch, stubStopwords):
+    """
+    Path to a cleaned test dataset of 30 instances, as a CSV file or stored with its sentences.
+    """
+
+    (tmp_path / "data" / "cleaned").mkdir(parents = True)
+    monkeypatch.chdir(tmp_path)
+    writeCorpus(tmp_path / "s.data.xml", 15)
+    preprocess("s", None, "s.data.xml", False, grouped = request.param)
+    return outputPath("s", request.param)
+
+
+def test_classifyStreamResumesAfterLastChunk(cleanedDataset):
+    classifyStream(StubClassifier(), None, cleanedDataset, "expected.txt", chunkSize = 7)
+    with open("expected.txt") as file:
+        expected = file.read()
+    assert len(expected.splitlines()) == 30
+
+    with pytest.raises(RuntimeError):
+        classifyStream(StubClassifier(failAfter = 2), None, cleanedDataset, "results.txt", chunkSize = 7)
+    with open("results.txt.progress") as file:
+        assert json.load(file)["chunks"] == 2
+
+    # Predictions written after the saved progress are removed when the run is resumed
+    with open("results.txt", "a") as file:
+        file.write("d000.s014.t001 partial")
+    classifier = StubClassifier()
+    classifyStream(classifier, None, cleanedDataset, "results.txt", chunkSize = 7)
+
+    assert classifier.batches == 3
+    with open("results.txt") as file:
+        assert file.read() == expected
+    assert not os.path.exists("results.txt.progress")
+
+
+def test_classifyStreamRestartsWhenChunkSizeChanges(cleanedDataset):
+    with pytest.raises(RuntimeError):
+        classifyStream(StubClassifier(failAfter = 2), None, cleanedDataset, "results.txt", chunkSize = 7)
+
+    classifier = StubClassifier()
+    classifyStream(classifier, None, cleanedDataset, "results.txt", chunkSize = 10)
+
+    assert classifier.batches == 3
+    with open("results.txt") as file:
+        assert len(file.read().splitlines()) == 30
@@ -0,0 +1,194 @@
+import json
+import os
+import numpy as np
+
+
+def packStrings(strings):
+    """
+    Pack strings into one UTF-8 byte array.
+
+    :param strings: list of strings
+    :return: tuple of the byte array and the array with the start offset of each string and the end offset of the last one
+    """
+
+    encoded = [string.encode("utf-8") for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype = np.int64)
+    offsets[1:] = np.cumsum([len(string) for string in encoded])
+    return np.frombuffer(b"".join(encoded), dtype = np.uint8), offsets
+
+
+def saveArrays(directory, arrays, metadataFileName, metadata, removedArrays = ()):
+    """
+    Save arrays as .npy files that can be memory-mapped, and a JSON metadata file.
+
+    :param directory: directory to write the files to
+    :param arrays: dictionary with key: file name without .npy, value: array
+    :param metadataFileName: file name of the metadata
+    :param metadata: dictionary with the metadata
+    :param removedArrays: names of arrays that are removed from the directory if they exist
+    """
+
+    os.makedirs(directory, exist_ok = True)
+
+    # The metadata is removed first and written last, so a directory without it is incomplete
+    metadataPath = os.path.join(directory, metadataFileName)
+    if os.path.exists(metadataPath):
+        os.remove(metadataPath)
+    for name in removedArrays:
+        if os.path.exists(os.path.join(directory, name + ".npy")):
+            os.remove(os.path.join(directory, name + ".npy"))
+
+    # Each file is replaced instead of overwritten, since the arrays can be memory-mapped from the files of the same directory
+    for name, array in arrays.items():
+        filePath = os.path.join(directory, name + ".npy")
+        with open(filePath + ".tmp", "wb") as file:
+            np.save(file, array)
+        os.replace(filePath + ".tmp", filePath)
+
+    with open(metadataPath, "w") as file:
+        json.dump(metadata, file)
+
+
+class StringArray:
+    """
+    Read-only list of strings packed by packStrings, decoded on access.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob        # Byte array with the UTF-8 encoded strings
+        self.offsets = offsets  # Array with the start offset of each string and the end offset of the last one
+
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+    def getBytes(self, index):
+        return self.blob[self.offsets[index]:self.offsets[index + 1]].tobytes()
+
+
+    def __getitem__(self, index):
+        return self.getBytes(index).decode("utf-8")
+
+
+    def tolist(self):
+        """
+        :return: list of all strings
+        """
+
+        data = self.blob.tobytes()
+        offsets = self.offsets.tolist()
+        return [data[start:end].decode("utf-8") for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+class Vocabulary:
+    """
+    Interned tokens with integer ids. Ids are assigned in the order tokens are added and never change,
+    so sequences of tokens can be stored as int32 arrays and looked up in O(1).
+    """
+
+    def __init__(self, tokens = ()):
+        self.tokens = []    # List of tokens, indexed by id
+        self.ids = {}       # Dictionary with key: token, value: id
+        for token in tokens:
+            self.add(token)
+
+
+    def __len__(self):
+        return len(self.tokens)
+
+
+    def __iter__(self):
+        return iter(self.tokens)
+
+
+    def __contains__(self, token):
+        return token in self.ids
+
+
+    def __getitem__(self, tokenId):
+        return self.tokens[tokenId]
+
+
+    def add(self, token):
+        """
+        Intern a token.
+
+        :param token: the token
+        :return: id of the token, a new id if the token was not in the vocabulary
+        """
+
+        tokenId = self.ids.get(token)
+        if tokenId is None:
+            tokenId = self.ids[token] = len(self.tokens)
+            self.tokens.append(token)
+        return tokenId
+
+
+    def get(self, token, default = -1):
+        """
+        :param token: the token
+        :param default: value returned for tokens that are not in the vocabulary
+        :return: id of the token
+        """
+
+        return self.ids.get(token, default)
+
+
+    def encode(self, tokens, add = False):
+        """
+        :param tokens: iterable of tokens
+        :param add: boolean value - intern tokens that are not in the vocabulary? Otherwise they get id -1
+        :return: int32 array with the id of each token
+        """
+
+        if add:
+            return np.array([self.add(token) for token in tokens], dtype = np.int32)
+        return np.array([self.ids.get(token, -1) for token in tokens], dtype = np.int32)
+
+
+    def decode(self, tokenIds):
+        """
+        :param tokenIds: iterable of token ids
+        :return: list of tokens
+        """
+
+        return [self.tokens[tokenId] for tokenId in tokenIds]
+
+
+    def mapTo(self, ids):
+        """
+        Translate the ids of this vocabulary to the ids of another one.
+
+        :param ids: Vocabulary, or dictionary with key: token, value: id
+        :return: int64 array with the id in ids of each token of this vocabulary, or -1
+        """
+
+        if isinstance(ids, Vocabulary):
+            ids = ids.ids
+        return np.array([ids.get(token, -1) for token in self.tokens], dtype = np.int64)
+
+
+    def save(self, directory):
+        """
+        Save the tokens as a packed UTF-8 array and its offsets.
+
+        :param directory: directory to write tokens.npy and tokenOffsets.npy to
+        """
+
+        blob, offsets = packStrings(self.tokens)
+        np.save(os.path.join(directory, "tokens.npy"), blob)
+        np.save(os.path.join(directory, "tokenOffsets.npy"), offsets)
+
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Load tokens saved by save, with the same ids.
+
+        :param directory: directory of the token files
+        :return: Vocabulary
+        """
+
+        strings = StringArray(np.load(os.path.join(directory, "tokens.npy")), np.load(os.path.join(directory, "tokenOffsets.npy")))
+        return cls(strings.tolist())
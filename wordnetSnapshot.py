@@ -0,0 +1,240 @@
+import json
+import os
+import re
+import numpy as np
+from vocabulary import packStrings, saveArrays, StringArray
+
+SNAPSHOT_DIRECTORY = "models/wordnet"
+
+# Parts of speech with their own synset lists, the first slot is for any part of speech
+POS_SLOTS = [None, "n", "v", "a", "r"]
+
+
+def findSorted(strings, key, order = None):
+    """
+    Binary search for a string in a StringArray sorted by UTF-8 bytes.
+
+    :param strings: the StringArray
+    :param key: the string to search for
+    :param order: array with the positions of the strings in sorted order, if the StringArray itself is not sorted
+    :return: position of the string, or -1 if it is not found
+    """
+
+    key = key.encode("utf-8")
+    low, high = 0, len(strings)
+    while low < high:
+        middle = (low + high) // 2
+        position = middle if order is None else int(order[middle])
+        value = strings.getBytes(position)
+        if value < key:
+            low = middle + 1
+        elif value > key:
+            high = middle
+        else:
+            return position
+    return -1
+
+
+def wordnetVersion():
+    """
+    Read the version of the installed WordNet from the license header of its data files,
+    which is much faster than wn.get_version because WordNet is not loaded.
+
+    :return: the WordNet version, e.g. 3.0
+    """
+
+    import nltk
+    try:
+        with nltk.data.find("corpora/wordnet/data.adj").open() as file:
+            for line in file:
+                line = line.decode("utf-8")
+                if not line.startswith(" "):
+                    break
+                match = re.search(r"Word[nN]et (\d+|\d+\.\d+) Copyright", line)
+                if match is not None:
+                    return match.group(1)
+    except LookupError:
+        pass
+
+    from nltk.corpus import wordnet as wn
+    return wn.get_version()
+
+
+def buildSnapshot(directory = SNAPSHOT_DIRECTORY, extraWords = ()):
+    """
+    Export the parts of WordNet used by the classifiers to arrays that can be memory-mapped by WordNetSnapshot:
+    the ordered synsets of each word for any and each part of speech, and the name, sense keys, definition and examples of each synset.
+
+    :param directory: directory to write the snapshot files to
+    :param extraWords: words to add that are not lemma names in WordNet, e.g. the target words of the test datasets,
+                       which WordNet only finds after morphological processing
+    """
+
+    from nltk.corpus import wordnet as wn
+
+    synsets = list(wn.all_synsets())
+    synsetIds = {synset.name(): synsetId for synsetId, synset in enumerate(synsets)}
+
+    # WordNet lower-cases words when looking up synsets
+    words = sorted(set(wn.all_lemma_names()) | {word.lower() for word in extraWords}, key = lambda word: word.encode("utf-8"))
+    wordSynsets = []
+    wordSynsetCounts = []
+    for word in words:
+        for pos in POS_SLOTS:
+            synsetList = wn.synsets(word, pos)
+            wordSynsets += [synsetIds[synset.name()] for synset in synsetList]
+            wordSynsetCounts.append(len(synsetList))
+
+    names = [synset.name() for synset in synsets]
+    senseKeys = [[lemma.key() for lemma in synset.lemmas()] for synset in synsets]
+    examples = [synset.examples() for synset in synsets]
+
+    arrays = {}
+    arrays["words"], arrays["wordOffsets"] = packStrings(words)
+    arrays["wordSynsetIndptr"] = np.concatenate([[0], np.cumsum(wordSynsetCounts)]).astype(np.int64)
+    arrays["wordSynsets"] = np.array(wordSynsets, dtype = np.int32)
+    arrays["names"], arrays["nameOffsets"] = packStrings(names)
+    arrays["nameOrder"] = np.array(sorted(range(len(names)), key = lambda synsetId: names[synsetId].encode("utf-8")), dtype = np.int32)
+    arrays["senseKeys"], arrays["senseKeyOffsets"] = packStrings([key for keys in senseKeys for key in keys])
+    arrays["senseKeyIndptr"] = np.concatenate([[0], np.cumsum([len(keys) for keys in senseKeys])]).astype(np.int64)
+    arrays["definitions"], arrays["definitionOffsets"] = packStrings([synset.definition() for synset in synsets])
+    arrays["examples"], arrays["exampleOffsets"] = packStrings([example for synsetExamples in examples for example in synsetExamples])
+    arrays["exampleIndptr"] = np.concatenate([[0], np.cumsum([len(synsetExamples) for synsetExamples in examples])]).astype(np.int64)
+
+    metadata = {"wordnetVersion": wordnetVersion(), "nSynsets": len(synsets), "nWords": len(words)}
+    saveArrays(directory, arrays, "snapshot.json", metadata)
+
+
+def hasSnapshot(directory = SNAPSHOT_DIRECTORY):
+    """
+    Check if a complete snapshot has been built from the installed version of WordNet.
+
+    :param directory: directory of the snapshot files
+    :return: boolean value - can the snapshot be loaded?
+    """
+
+    metadataPath = os.path.join(directory, "snapshot.json")
+    if not os.path.exists(metadataPath):
+        return False
+    with open(metadataPath) as file:
+        return json.load(file)["wordnetVersion"] == wordnetVersion()
+
+
+class WordNetSnapshot:
+    """
+    Reader of a snapshot built by buildSnapshot. The arrays are memory-mapped read-only, so loading is instant
+    and processes that load the same snapshot share its pages. Synsets are identified by their position in wn.all_synsets().
+    """
+
+    def __init__(self, directory = SNAPSHOT_DIRECTORY):
+        with open(os.path.join(directory, "snapshot.json")) as file:
+            metadata = json.load(file)
+        self.directory = directory
+        self.version = metadata["wordnetVersion"]   # Version of WordNet the snapshot was built from
+
+        def load(name):
+            return np.load(os.path.join(directory, name + ".npy"), mmap_mode = "r")
+
+        self.words = StringArray(load("words"), load("wordOffsets"))
+        self.wordSynsetIndptr = load("wordSynsetIndptr")
+        self.wordSynsets = load("wordSynsets")
+        self.names = StringArray(load("names"), load("nameOffsets"))
+        self.nameOrder = load("nameOrder")
+        self.senseKeyStrings = StringArray(load("senseKeys"), load("senseKeyOffsets"))
+        self.senseKeyIndptr = load("senseKeyIndptr")
+        self.definitions = StringArray(load("definitions"), load("definitionOffsets"))
+        self.exampleStrings = StringArray(load("examples"), load("exampleOffsets"))
+        self.exampleIndptr = load("exampleIndptr")
+
+
+    def __len__(self):
+        return len(self.names)
+
+
+    def synsets(self, word, pos = None):
+        """
+        Find the synsets of a word in the same order as wn.synsets. Words that are not in the snapshot are looked up in WordNet,
+        which is only loaded if that happens.
+
+        :param word: the word
+        :param pos: part of speech out of n, v, a and r, or None for any part of speech
+        :return: list of synset ids
+        """
+
+        word = word.lower()
+        position = findSorted(self.words, word)
+        if position < 0:
+            from nltk.corpus import wordnet as wn
+            return [self.synsetId(synset.name()) for synset in wn.synsets(word, pos)]
+
+        slot = position * len(POS_SLOTS) + POS_SLOTS.index(pos)
+        return self.wordSynsets[self.wordSynsetIndptr[slot]:self.wordSynsetIndptr[slot + 1]].tolist()
+
+
+    def synsetId(self, name):
+        """
+        :param name: name of a synset, e.g. dog.n.01
+        :return: id of the synset
+        """
+
+        synsetId = findSorted(self.names, name, self.nameOrder)
+        if synsetId < 0:
+            raise KeyError(name)
+        return synsetId
+
+
+    def name(self, synsetId):
+        return self.names[synsetId]
+
+
+    def senseKeys(self, synsetId):
+        """
+        :param synsetId: id of a synset
+        :return: list with the sense key of each lemma of the synset, in the same order as synset.lemmas()
+        """
+
+        return [self.senseKeyStrings[index] for index in range(self.senseKeyIndptr[synsetId], self.senseKeyIndptr[synsetId + 1])]
+
+
+    def senseKey(self, synsetId):
+        """
+        :param synsetId: id of a synset
+        :return: sense key of the first lemma of the synset
+        """
+
+        return self.senseKeyStrings[self.senseKeyIndptr[synsetId]]
+
+
+    def definition(self, synsetId):
+        return self.definitions[synsetId]
+
+
+    def examples(self, synsetId):
+        """
+        :param synsetId: id of a synset
+        :return: list of the example sentences of the synset
+        """
+
+        return [self.exampleStrings[index] for index in range(self.exampleIndptr[synsetId], self.exampleIndptr[synsetId + 1])]
+
+
+    def allWords(self):
+        """
+        :return: iterator over the words in the snapshot, sorted by UTF-8 bytes
+        """
+
+        return (self.words[position] for position in range(len(self.words)))
+
+
+def loadSnapshot(directory = SNAPSHOT_DIRECTORY, extraWords = ()):
+    """
+    Load the WordNet snapshot. The snapshot is built first if it does not exist or was built from another WordNet version.
+
+    :param directory: directory of the snapshot files
+    :param extraWords: words to add if the snapshot is built, see buildSnapshot
+    :return: WordNetSnapshot
+    """
+
+    if not hasSnapshot(directory):
+        buildSnapshot(directory, extraWords)
+    return WordNetSnapshot(directory)